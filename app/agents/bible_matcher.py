@@ -1,38 +1,64 @@
 import json
 import os
-from typing import List, Dict, Any, Optional
+import re
+from bisect import bisect_left, bisect_right
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
+from app.agents.semantic import SemanticIndex
+from app.agents.verse_store import VerseStore
+
+DEFAULT_DATA_PATH = Path(os.getenv("BIBLE_DATA_PATH", str(Path("data") / "bible_verses.json")))
+DEFAULT_TRANSLATION = os.getenv("BIBLE_TRANSLATION", "default")
+
+# "John 3:16", "Philippians 4:6-7", "Psalm 23"
+REFERENCE_PATTERN = re.compile(r'([1-3]?\s?[A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+(\d+)(?::(\d+)(?:\s*-\s*(\d+))?)?')
 
 class BibleMatchingAgent:
-    def __init__(self):
+    def __init__(self, data_path: Optional[Path] = None, translation: str = DEFAULT_TRANSLATION):
         # Load Bible data
-        self.bible_data = self._load_bible_data()
-        self.topic_to_verses = self._load_topic_index()
+        self.data_path = Path(data_path) if data_path else DEFAULT_DATA_PATH
+        self.translation = translation
+        self.verses = self._load_verse_store()
+        self.chapter_slices = MappingProxyType(self.verses.chapter_slices)
+        self.topic_to_verses = MappingProxyType(self._load_topic_index())
+        # Optional LSA index for topics outside topic_to_verses, mapped on first use (imports numpy)
+        self._semantic_index: Optional[SemanticIndex] = None
+        self._semantic_opened = False
         
         # New Testament books in order
-        self.new_testament_books = [
+        self.new_testament_books = (
             "Matthew", "Mark", "Luke", "John", "Acts",
             "Romans", "1 Corinthians", "2 Corinthians", "Galatians", "Ephesians",
             "Philippians", "Colossians", "1 Thessalonians", "2 Thessalonians",
             "1 Timothy", "2 Timothy", "Titus", "Philemon", "Hebrews", "James",
             "1 Peter", "2 Peter", "1 John", "2 John", "3 John", "Jude", "Revelation"
-        ]
+        )
         
         # Chapters per book in New Testament
-        self.book_chapters = {
+        self.book_chapters = MappingProxyType({
             "Matthew": 28, "Mark": 16, "Luke": 24, "John": 21, "Acts": 28,
             "Romans": 16, "1 Corinthians": 16, "2 Corinthians": 13, "Galatians": 6,
             "Ephesians": 6, "Philippians": 4, "Colossians": 4, "1 Thessalonians": 5,
             "2 Thessalonians": 3, "1 Timothy": 6, "2 Timothy": 4, "Titus": 3,
             "Philemon": 1, "Hebrews": 13, "James": 5, "1 Peter": 5, "2 Peter": 3,
             "1 John": 5, "2 John": 1, "3 John": 1, "Jude": 1, "Revelation": 22
-        }
+        })
+    
+    def _load_verse_store(self) -> VerseStore:
+        """Memory-map the compiled corpus, falling back to parsing the JSON file"""
+        store_path = self.data_path.with_suffix(".bin")
+        if store_path.exists() and (
+            not self.data_path.exists()
+            or store_path.stat().st_mtime >= self.data_path.stat().st_mtime
+        ):
+            return VerseStore.open(store_path)
+        return VerseStore.from_verses(self._load_bible_data().get("verses", []))
     
     def _load_bible_data(self) -> Dict:
         """Load Bible verses from JSON file"""
-        data_path = Path("data") / "bible_verses.json"
-        if data_path.exists():
-            with open(data_path, 'r', encoding='utf-8') as f:
+        if self.data_path.exists():
+            with open(self.data_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         else:
             # For MVP, use a small sample
@@ -58,17 +84,17 @@ class BibleMatchingAgent:
             ]
         }
     
-    def _load_topic_index(self) -> Dict[str, List[str]]:
+    def _load_topic_index(self) -> Dict[str, Tuple[str, ...]]:
         """Load topic to verse mapping"""
         # This would be a pre-built index
         return {
-            "anxiety": ["Philippians 4:6-7", "1 Peter 5:7", "Matthew 6:34"],
-            "fear": ["Isaiah 41:10", "2 Timothy 1:7", "Psalm 23:4"],
-            "peace": ["John 14:27", "Philippians 4:7", "Isaiah 26:3"],
-            "hope": ["Jeremiah 29:11", "Romans 15:13", "Psalm 42:11"],
-            "love": ["1 Corinthians 13:4-7", "John 3:16", "Romans 8:38-39"],
-            "faith": ["Hebrews 11:1", "Matthew 17:20", "2 Corinthians 5:7"],
-            "encouragement": ["Joshua 1:9", "Isaiah 40:31", "Romans 8:28"]
+            "anxiety": ("Philippians 4:6-7", "1 Peter 5:7", "Matthew 6:34"),
+            "fear": ("Isaiah 41:10", "2 Timothy 1:7", "Psalm 23:4"),
+            "peace": ("John 14:27", "Philippians 4:7", "Isaiah 26:3"),
+            "hope": ("Jeremiah 29:11", "Romans 15:13", "Psalm 42:11"),
+            "love": ("1 Corinthians 13:4-7", "John 3:16", "Romans 8:38-39"),
+            "faith": ("Hebrews 11:1", "Matthew 17:20", "2 Corinthians 5:7"),
+            "encouragement": ("Joshua 1:9", "Isaiah 40:31", "Romans 8:28")
         }
     
     def get_daily_reading(self, current_book: str, last_chapter: int) -> Dict[str, Any]:
@@ -111,8 +137,16 @@ class BibleMatchingAgent:
             "is_new_book": False
         }
     
+    @property
+    def semantic_index(self) -> Optional[SemanticIndex]:
+        """The LSA index, or None without numpy or a built index"""
+        if not self._semantic_opened:
+            self._semantic_index = SemanticIndex.open(self.data_path, len(self.verses))
+            self._semantic_opened = True
+        return self._semantic_index
+    
     def find_verses_by_topic(self, topic: str, limit: int = 3) -> List[Dict[str, Any]]:
-        """Find verses by topic"""
+        """Find verses by topic: curated references first, then the semantic index"""
         if topic in self.topic_to_verses:
             verse_refs = self.topic_to_verses[topic][:limit]
             verses = []
@@ -121,26 +155,70 @@ class BibleMatchingAgent:
                 if verse_data:
                     verses.append(verse_data)
             return verses
+        if self.semantic_index is not None:
+            return [self.verses[index] for index, _ in self.semantic_index.top_verses(topic, limit)]
         return []
     
     def get_verse_by_reference(self, reference: str) -> Optional[Dict[str, Any]]:
-        """Get verse by reference (e.g., 'John 3:16')"""
-        # Parse reference
-        import re
-        match = re.match(r'([1-3]?\s?[A-Za-z]+)\s+(\d+):(\d+)', reference)
-        if match:
-            book = match.group(1).title()
-            chapter = int(match.group(2))
-            verse = int(match.group(3))
-            
-            # Search in data
-            for verse_data in self.bible_data.get("verses", []):
-                if (verse_data["book"] == book and 
-                    verse_data["chapter"] == chapter and 
-                    verse_data["verse"] == verse):
-                    return verse_data
+        """Get verse by reference (e.g., 'John 3:16'); ranges and chapters are joined into one passage"""
+        verses = self.get_passage(reference)
+        if not verses:
+            return None
+        if len(verses) == 1:
+            return verses[0]
+        
+        first, last = verses[0], verses[-1]
+        return {
+            "book": first["book"],
+            "chapter": first["chapter"],
+            "verse": f"{first['verse']}-{last['verse']}",
+            "text": " ".join(v["text"] for v in verses)
+        }
+    
+    def get_passage(self, reference: str) -> List[Dict[str, Any]]:
+        """Get all verses for 'John 3:16', 'Philippians 4:6-7' or a whole chapter like 'Psalm 23'"""
+        match = REFERENCE_PATTERN.match(reference.strip())
+        if not match:
+            return []
+        
+        book = match.group(1).title()
+        chapter = int(match.group(2))
+        if match.group(3) is None:
+            return self.get_chapter(book, chapter)
+        
+        verse_start = int(match.group(3))
+        verse_end = int(match.group(4)) if match.group(4) else verse_start
+        return self.get_verse_range(book, chapter, verse_start, verse_end)
+    
+    def get_chapter(self, book: str, chapter: int) -> List[Dict[str, Any]]:
+        """Get every verse of a chapter as one contiguous slice"""
+        bounds = self.chapter_slices.get((book, chapter))
+        if bounds is None:
+            return []
+        return self.verses[bounds[0]:bounds[1]]
+    
+    def get_verse_range(self, book: str, chapter: int, verse_start: int, verse_end: int) -> List[Dict[str, Any]]:
+        """Get verses verse_start..verse_end (inclusive) of a chapter"""
+        bounds = self.chapter_slices.get((book, chapter))
+        if bounds is None or verse_end < verse_start:
+            return []
+        
+        start, end = bounds
+        lo = self._verse_position(start, end, verse_start, bisect_left)
+        hi = self._verse_position(start, end, verse_end, bisect_right)
+        return self.verses[lo:hi]
+    
+    def _verse_position(self, start: int, end: int, verse: int, bisect) -> int:
+        """Position of a verse inside its chapter slice.
         
-        return None
+        Chapters are numbered contiguously, so the offset from the first verse
+        is almost always exact; gaps in a partial corpus fall back to bisection.
+        """
+        numbers = self.verses.verse_numbers
+        guess = start + verse - numbers[start]
+        if start <= guess < end and numbers[guess] == verse:
+            return guess if bisect is bisect_left else guess + 1
+        return bisect(numbers, verse, start, end)
     
     def generate_reflection_question(self, book: str, chapter: int) -> str:
         """Generate reflection question for daily reading"""
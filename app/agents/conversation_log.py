@@ -0,0 +1,128 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
+from app import models
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+class ConversationLogWriter:
+    """Write-behind queue for Conversation audit rows.
+
+    The webhook enqueues rows instead of inserting them, and a background
+    thread bulk-inserts them in batches when batch_size rows are waiting or
+    flush_interval seconds have passed. The queue is bounded: when it is full
+    enqueue() returns False and the caller writes the row itself, so overload
+    slows requests down instead of growing memory or dropping logs. stop()
+    (also run at exit) drains whatever is still queued.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = 200,
+                 flush_interval: float = 1.0, max_queue: int = 10000):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def start(self):
+        """Start the flusher thread (idempotent; restarts in a forked child)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, user_id: int, message_type: str, content: str,
+                intent: Optional[str] = None, metadata: Optional[Dict] = None) -> bool:
+        """Queue a row for insertion; False means the queue is full and the caller must write it"""
+        # Also restarts after stop(), e.g. when an app lifespan runs again in the same process
+        if self._thread is None or self._pid != os.getpid():
+            self.start()
+        row = {
+            "user_id": user_id,
+            "message_type": message_type,
+            "content": content,
+            "intent": intent,
+            "message_metadata": metadata or {},
+            "created_at": datetime.utcnow()
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the flusher thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        # The sentinel goes in behind every queued row, so it is seen only after they are batched
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+    def _run(self):
+        while True:
+            # Block until there is work, then give the batch flush_interval to fill up
+            row = self._queue.get()
+            if row is None:
+                return
+            batch: List[Dict[str, Any]] = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    self._write(batch)
+                    return
+                batch.append(row)
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        db = self.session_factory()
+        try:
+            db.execute(insert(models.Conversation), batch)
+            db.commit()
+            self.written += len(batch)
+        except Exception:
+            db.rollback()
+            self.failed += len(batch)
+            logger.exception("Failed to write %d conversation rows", len(batch))
+        finally:
+            db.close()
+
+conversation_log = ConversationLogWriter()
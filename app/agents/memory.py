@@ -1,32 +1,186 @@
+import os
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
-from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional, List, Set
+from sqlalchemy import func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 from app import models, schemas
+from app.metrics import span, timed
+from app.agents.conversation_log import ConversationLogWriter
+from app.cache import LRUCache
+
+# Per-worker cache of committed user rows, keyed ("phone", number) and ("id", id).
+# Entries are dropped on every write through MemoryAgent in this worker; the
+# short TTL bounds how stale another worker's view can get.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+user_cache = LRUCache(maxsize=10000, ttl=USER_CACHE_TTL)
+
+def _insert_ignoring_conflicts(db: Session, model, column: str):
+    """INSERT that skips a row whose unique `column` is already taken (SQLite and Postgres)"""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model).on_conflict_do_nothing(index_elements=[column])
 
 class MemoryAgent:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, log_writer: Optional[ConversationLogWriter] = None,
+                 user_cache: Optional[LRUCache] = None):
         self.db = db
+        self.log_writer = log_writer
+        self.user_cache = user_cache
+        self._unit_of_work = False
+        self._changed_users: Set[tuple] = set()
+        # Write-behind conversation rows staged by a unit of work, queued only once it commits
+        self._deferred_logs: List[tuple] = []
+    
+    @contextmanager
+    def unit_of_work(self):
+        """Stage every write made inside the block and commit once at the end.
+        
+        Any exception rolls the whole request back, including its
+        write-behind conversation rows. Nested blocks join the outer one.
+        """
+        if self._unit_of_work:
+            yield self
+            return
+        self._unit_of_work = True
+        try:
+            yield self
+            self._commit_unit_of_work()
+        except BaseException:
+            self._rollback_unit_of_work()
+            raise
+        finally:
+            self._end_unit_of_work()
+    
+    # The steps of a unit of work, shared with AsyncMemoryAgent (which runs them through run_sync)
+    def _commit_unit_of_work(self):
+        with span("memory.commit"):
+            self.db.commit()
+        if self._enqueue_deferred_logs():
+            self.db.commit()
+    
+    def _rollback_unit_of_work(self):
+        self._deferred_logs.clear()
+        self.db.rollback()
+    
+    def _end_unit_of_work(self):
+        self._unit_of_work = False
+        self._invalidate_changed_users()
+    
+    def _commit(self, need_identity: bool = False):
+        """Commit now, or inside a unit of work defer to its single commit.
+        
+        need_identity flushes pending INSERTs so generated ids are available;
+        otherwise writes stay in the session until the unit of work ends,
+        which keeps SQLite's write lock short.
+        """
+        if not self._unit_of_work:
+            self.db.commit()
+            self._invalidate_changed_users()
+        elif need_identity:
+            self.db.flush()
+    
+    def _enqueue_deferred_logs(self) -> bool:
+        """Hand committed conversation rows to the log writer; True if any were staged in the session instead"""
+        rows, self._deferred_logs = self._deferred_logs, []
+        staged = False
+        for row in rows:
+            if not self.log_writer.enqueue(*row):
+                self.db.add(self._conversation(*row))
+                staged = True
+        return staged
+    
+    @staticmethod
+    def _conversation(user_id: int, message_type: str, content: str,
+                      intent: Optional[str], metadata: Optional[Dict]) -> models.Conversation:
+        return models.Conversation(
+            user_id=user_id,
+            message_type=message_type,
+            content=content,
+            intent=intent,
+            message_metadata=metadata or {}
+        )
+    
+    def _cache_user(self, user: models.User):
+        if self.user_cache is None:
+            return
+        snapshot = {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
+        self.user_cache.set(("phone", user.phone_number), snapshot)
+        self.user_cache.set(("id", user.id), snapshot)
+    
+    def _cached_user(self, key: tuple) -> Optional[models.User]:
+        """Attach a cached snapshot to the session as a persistent object, without a SELECT"""
+        if self.user_cache is None:
+            return None
+        snapshot = self.user_cache.get(key)
+        if snapshot is None:
+            return None
+        user = models.User(**snapshot)
+        make_transient_to_detached(user)
+        return self.db.merge(user, load=False)
+    
+    def _user_changed(self, user: models.User):
+        """Drop the user from the cache now and again once the write is committed"""
+        self._changed_users.add((user.id, user.phone_number))
+        if self.user_cache is not None:
+            self.user_cache.pop(("id", user.id))
+            self.user_cache.pop(("phone", user.phone_number))
+    
+    def _invalidate_changed_users(self):
+        if self.user_cache is not None:
+            for user_id, phone_number in self._changed_users:
+                self.user_cache.pop(("id", user_id))
+                self.user_cache.pop(("phone", phone_number))
+        self._changed_users.clear()
     
-    def get_or_create_user(self, phone_number: str) -> models.User:
-        """Get user by phone number or create if not exists"""
+    def _get_user(self, user_id: int) -> Optional[models.User]:
+        """Read-only user lookup: session identity map, then cache, then database"""
+        user = self.db.identity_map.get(self.db.identity_key(models.User, user_id))
+        if user is None:
+            user = self._cached_user(("id", user_id))
+        if user is None:
+            user = self.db.get(models.User, user_id)
+            if user is not None:
+                self._cache_user(user)
+        return user
+    
+    @timed("memory.get_or_create_user")
+    def get_or_create_user(self, phone_number: str, fresh: bool = False) -> models.User:
+        """Get user by phone number or create if not exists.
+        
+        Pass fresh=True when the request is going to write to the user, so the
+        write starts from the database row rather than a cached snapshot.
+        """
+        if not fresh:
+            user = self._cached_user(("phone", phone_number))
+            if user is not None:
+                return user
+        
         user = self.db.query(models.User).filter(
             models.User.phone_number == phone_number
         ).first()
+        if user:
+            self._cache_user(user)
         
         if not user:
-            user = models.User(
+            # Concurrent first messages from one number race to insert it: the loser's INSERT
+            # does nothing and both read back one row, inside the caller's transaction
+            self.db.execute(_insert_ignoring_conflicts(self.db, models.User, "phone_number").values(
                 phone_number=phone_number,
                 current_book="Matthew",
                 last_chapter=0,
                 total_days_engaged=0,
                 current_streak=0
-            )
-            self.db.add(user)
-            self.db.commit()
-            self.db.refresh(user)
+            ))
+            self._commit()
+            user = self.db.query(models.User).filter(
+                models.User.phone_number == phone_number
+            ).one()
         
         return user
     
+    @timed("memory.update_user_progress")
     def update_user_progress(self, user_id: int, book: str, chapter_start: int, chapter_end: int) -> models.UserProgress:
         """Record user's daily reading progress"""
         progress = models.UserProgress(
@@ -40,11 +194,15 @@ class MemoryAgent:
         self.db.add(progress)
         
         
-        user = self.db.query(models.User).filter(models.User.id == user_id).first()
+        user = self.db.get(models.User, user_id)
         if user:
+            self._user_changed(user)
             user.last_chapter = chapter_end
             user.current_book = book
-            user.total_days_engaged += 1
+            # Denormalized counters, kept in the same transaction as the progress row. Incremented
+            # in the UPDATE itself, so concurrent check-ins can't overwrite each other's count.
+            user.total_days_engaged = func.coalesce(models.User.total_days_engaged, 0) + 1
+            user.chapters_read = func.coalesce(models.User.chapters_read, 0) + (chapter_end - chapter_start + 1)
             
             
             today = datetime.utcnow().date()
@@ -62,9 +220,10 @@ class MemoryAgent:
             else:
                 user.current_streak = 1
         
-        self.db.commit()
+        self._commit()
         return progress
     
+    @timed("memory.add_bookmark")
     def add_bookmark(self, user_id: int, verse_ref: str, note: Optional[str] = None) -> models.Bookmark:
         """Save a verse as bookmark"""
         
@@ -80,25 +239,38 @@ class MemoryAgent:
             tags=[]
         )
         self.db.add(bookmark)
-        self.db.commit()
-        self.db.refresh(bookmark)
+        
+        user = self.db.get(models.User, user_id)
+        if user:
+            self._user_changed(user)
+            user.total_bookmarks = func.coalesce(models.User.total_bookmarks, 0) + 1
+        
+        self._commit()
+        if not self._unit_of_work:
+            self.db.refresh(bookmark)
         return bookmark
     
+    @timed("memory.get_user_bookmarks")
     def get_user_bookmarks(self, user_id: int) -> List[models.Bookmark]:
         """Get all bookmarks for a user"""
         return self.db.query(models.Bookmark).filter(
             models.Bookmark.user_id == user_id
         ).order_by(models.Bookmark.created_at.desc()).all()
     
+    @timed("memory.get_user_stats")
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
-        """Get user statistics"""
-        user = self.db.query(models.User).filter(models.User.id == user_id).first()
+        """Get user statistics from the counters kept on the user row"""
+        user = self._get_user(user_id)
         if not user:
             return {}
         
-        
+        return self.stats_for_user(user)
+    
+    @staticmethod
+    def stats_for_user(user: models.User) -> Dict[str, Any]:
+        """Build the stats dict from an already-loaded user, with no queries"""
         total_nt_chapters = 260 
-        chapters_read = self._calculate_chapters_read(user_id)
+        chapters_read = user.chapters_read or 0
         
         return {
             "current_book": user.current_book,
@@ -107,36 +279,36 @@ class MemoryAgent:
             "current_streak": user.current_streak,
             "chapters_read": chapters_read,
             "completion_percentage": round((chapters_read / total_nt_chapters) * 100, 1),
-            "total_bookmarks": self.db.query(models.Bookmark).filter(
-                models.Bookmark.user_id == user_id
-            ).count()
+            "total_bookmarks": user.total_bookmarks or 0
         }
     
-    def _calculate_chapters_read(self, user_id: int) -> int:
-        """Calculate total chapters read by user"""
-        progress_entries = self.db.query(models.UserProgress).filter(
-            models.UserProgress.user_id == user_id
-        ).all()
-        
-        total = 0
-        for entry in progress_entries:
-            total += (entry.chapter_end - entry.chapter_start + 1)
-        
-        return total
-    
+    @timed("memory.save_conversation")
     def save_conversation(self, user_id: int, message_type: str, content: str, 
                          intent: Optional[str] = None, metadata: Optional[Dict] = None):
-        """Save conversation history"""
-        conversation = models.Conversation(
-            user_id=user_id,
-            message_type=message_type,
-            content=content,
-            intent=intent,
-            message_metadata=metadata or {}
-        )
-        self.db.add(conversation)
-        self.db.commit()
+        """Save conversation history (write-behind when a log writer is attached)"""
+        if self.log_writer and self._unit_of_work:
+            self._deferred_logs.append((user_id, message_type, content, intent, metadata))
+            return
+        if self.log_writer and self.log_writer.enqueue(user_id, message_type, content, intent, metadata):
+            return
+        
+        self.db.add(self._conversation(user_id, message_type, content, intent, metadata))
+        self._commit()
+    
+    @timed("memory.get_processed_reply")
+    def get_processed_reply(self, message_sid: str) -> Optional[str]:
+        """Reply already sent for a Twilio MessageSid, by any worker"""
+        return self.db.query(models.ProcessedMessage.reply).filter(
+            models.ProcessedMessage.message_sid == message_sid
+        ).scalar()
     
+    @timed("memory.save_processed_message")
+    def save_processed_message(self, message_sid: str, reply: str):
+        """Record the reply for a MessageSid; a second commit for the same sid raises IntegrityError"""
+        self.db.add(models.ProcessedMessage(message_sid=message_sid, reply=reply))
+        self._commit()
+    
+    @timed("memory.save_feedback")
     def save_feedback(self, user_id: int, rating: int, feedback_text: Optional[str] = None):
         """Save user feedback"""
         feedback = models.Feedback(
@@ -145,4 +317,66 @@ class MemoryAgent:
             feedback_text=feedback_text
         )
         self.db.add(feedback)
-        self.db.commit()
+        self._commit()
+
+
+class AsyncMemoryAgent:
+    """Async API over MemoryAgent for an AsyncSession.
+    
+    Every call runs the MemoryAgent logic through AsyncSession.run_sync, which
+    drives the asyncio driver (aiosqlite/asyncpg) from a greenlet. The event
+    loop is free while a query or commit is in flight, and the persistence
+    logic itself lives in one place.
+    """
+    
+    def __init__(self, db: AsyncSession, log_writer: Optional[ConversationLogWriter] = None,
+                 user_cache: Optional[LRUCache] = None):
+        self.db = db
+        self._agent = MemoryAgent(db.sync_session, log_writer, user_cache)
+    
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """Async counterpart of MemoryAgent.unit_of_work: one commit per block"""
+        if self._agent._unit_of_work:
+            yield self
+            return
+        self._agent._unit_of_work = True
+        try:
+            yield self
+            await self._run(self._agent._commit_unit_of_work)
+        except BaseException:
+            await self._run(self._agent._rollback_unit_of_work)
+            raise
+        finally:
+            self._agent._end_unit_of_work()
+    
+    async def _run(self, method, *args, **kwargs):
+        return await self.db.run_sync(lambda _: method(*args, **kwargs))
+    
+    async def get_or_create_user(self, phone_number: str, fresh: bool = False) -> models.User:
+        return await self._run(self._agent.get_or_create_user, phone_number, fresh)
+    
+    async def update_user_progress(self, user_id: int, book: str, chapter_start: int, chapter_end: int) -> models.UserProgress:
+        return await self._run(self._agent.update_user_progress, user_id, book, chapter_start, chapter_end)
+    
+    async def add_bookmark(self, user_id: int, verse_ref: str, note: Optional[str] = None) -> models.Bookmark:
+        return await self._run(self._agent.add_bookmark, user_id, verse_ref, note)
+    
+    async def get_user_bookmarks(self, user_id: int) -> List[models.Bookmark]:
+        return await self._run(self._agent.get_user_bookmarks, user_id)
+    
+    async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
+        return await self._run(self._agent.get_user_stats, user_id)
+    
+    async def save_conversation(self, user_id: int, message_type: str, content: str,
+                                intent: Optional[str] = None, metadata: Optional[Dict] = None):
+        return await self._run(self._agent.save_conversation, user_id, message_type, content, intent, metadata)
+    
+    async def get_processed_reply(self, message_sid: str) -> Optional[str]:
+        return await self._run(self._agent.get_processed_reply, message_sid)
+    
+    async def save_processed_message(self, message_sid: str, reply: str):
+        return await self._run(self._agent.save_processed_message, message_sid, reply)
+    
+    async def save_feedback(self, user_id: int, rating: int, feedback_text: Optional[str] = None):
+        return await self._run(self._agent.save_feedback, user_id, rating, feedback_text)
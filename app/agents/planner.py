@@ -1,11 +1,36 @@
 import re
-from typing import Dict, Any, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from app.schemas import WhatsAppMessage, AgentResponse
 
+VERSE_REFERENCE_PATTERN = re.compile(r'([1-3]?\s?[A-Za-z]+)\s*(\d+):(\d+(-\d+)?)')
+
+def _trie_pattern(phrases) -> str:
+    """Build a prefix-factored alternation so the regex engine walks a trie
+    instead of retrying every phrase at every position. Optional groups are
+    greedy, so the longest phrase wins ("pray for" over "pray")."""
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+    
+    return "(?:" + build(trie) + ")"
+
 class PlannerAgent:
     def __init__(self):
         self.intent_keywords = {
-            "daily_study": ["read", "study", "today", "chapter", "continue", "next"],
+            "daily_study": ["read", "study", "today", "daily", "chapter", "continue", "next"],
             "verse_request": ["verse", "scripture", "bible", "about", "help with", "feeling"],
             "prayer": ["pray", "prayer", "pray for"],
             "bookmark": ["save", "bookmark", "remember", "favorite"],
@@ -13,100 +38,164 @@ class PlannerAgent:
             "greeting": ["hello", "hi", "hey", "good morning", "good evening"],
             "help": ["help", "what can you do", "commands", "menu"]
         }
+        self.checkin_words = ["done", "finished", "read", "completed", "✓", "check"]
+        self.bookmark_words = ["save", "bookmark", "remember this", "favorite"]
+        self.positive_words = ["happy", "joy", "blessed", "thankful", "grateful", "excited"]
+        self.negative_words = ["sad", "anxious", "worried", "afraid", "angry", "tired", "stressed"]
+        self.stop_words = ["i'm", "i am", "feeling", "about", "my", "me", "please", "can you"]
+        
+        # Common topics mapping
+        self.topic_map = {
+            "anxious": "anxiety",
+            "worried": "anxiety",
+            "fear": "fear",
+            "scared": "fear",
+            "sad": "sadness",
+            "depressed": "depression",
+            "happy": "joy",
+            "joyful": "joy",
+            "angry": "anger",
+            "mad": "anger",
+            "tired": "weariness",
+            "stressed": "stress",
+            "peace": "peace",
+            "love": "love",
+            "hope": "hope",
+            "faith": "faith"
+        }
+        
+        self._intents = tuple(self.intent_keywords)
+        self._intent_order = {intent: rank for rank, intent in enumerate(self._intents)}
+        self._signals, self._matcher = self._compile_matcher()
+    
+    def _compile_matcher(self):
+        """Compile every keyword table into one word-boundary-aware regex.
+        
+        Each phrase maps to the signals it contributes (intent, check-in,
+        bookmark, mood, topic), so a single finditer pass over the message
+        yields everything analyze_intent needs.
+        """
+        signals: Dict[str, List[Tuple[str, str]]] = {}
+        
+        def add(phrases, kind, value=""):
+            for phrase in phrases:
+                signals.setdefault(phrase, []).append((kind, value))
+        
+        for intent, keywords in self.intent_keywords.items():
+            add(keywords, "intent", intent)
+        add(self.checkin_words, "checkin")
+        add(self.bookmark_words, "bookmark")
+        add(self.positive_words, "mood", "positive")
+        add(self.negative_words, "mood", "negative")
+        for word, topic in self.topic_map.items():
+            add([word], "topic", topic)
+        
+        # The regex matches one phrase per position, so a phrase also carries
+        # the signals of every shorter phrase it contains ("remember this" -> "remember")
+        for phrase in signals:
+            for other in signals:
+                if other != phrase and re.search(rf"(?<!\w){re.escape(other)}(?!\w)", phrase):
+                    signals[phrase] = signals[phrase] + [s for s in signals[other] if s not in signals[phrase]]
+        
+        return signals, re.compile(rf"(?<!\w){_trie_pattern(signals)}(?!\w)")
+    
+    def _scan(self, message_lower: str) -> Dict[str, Any]:
+        """Collect intent, topic, mood and check-in signals in one pass"""
+        intent_rank = None
+        topic = None
+        moods = set()
+        checkin = bookmark = False
+        for match in self._matcher.finditer(message_lower):
+            for kind, value in self._signals[match.group()]:
+                if kind == "intent":
+                    rank = self._intent_order[value]
+                    if intent_rank is None or rank < intent_rank:
+                        intent_rank = rank
+                elif kind == "topic":
+                    if topic is None:
+                        topic = value
+                elif kind == "mood":
+                    moods.add(value)
+                elif kind == "checkin":
+                    checkin = True
+                else:
+                    bookmark = True
+        
+        return {
+            "intent": self._intents[intent_rank] if intent_rank is not None else None,
+            "topic": topic,
+            "mood": "positive" if "positive" in moods else "negative" if "negative" in moods else "neutral",
+            "checkin": checkin,
+            "bookmark": bookmark
+        }
     
     def analyze_intent(self, message: str) -> Dict[str, Any]:
         """Analyze user message and determine intent"""
         message_lower = message.lower()
+        signals = self._scan(message_lower)
         
         # Check for specific patterns
-        if self._is_daily_checkin(message_lower):
+        if signals["checkin"] and len(message_lower.split()) < 5:
             return {"intent": "daily_checkin", "action": "mark_complete"}
         
-        if self._is_bookmark_request(message_lower):
+        if signals["bookmark"]:
             verse_ref = self._extract_verse_reference(message)
             if verse_ref:
                 return {"intent": "bookmark", "verse": verse_ref, "action": "save"}
         
-        # Check keyword matches
-        for intent, keywords in self.intent_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                # Special handling for verse requests
-                if intent == "verse_request":
-                    topic = self._extract_topic(message_lower)
-                    return {
-                        "intent": "verse_request",
-                        "topic": topic,
-                        "mood": self._detect_mood(message_lower)
-                    }
-                return {"intent": intent}
+        intent = signals["intent"]
+        if intent == "verse_request":
+            # Special handling for verse requests
+            return {
+                "intent": "verse_request",
+                "topic": signals["topic"] or self._extract_topic(message_lower),
+                "mood": signals["mood"]
+            }
+        if intent:
+            return {"intent": intent}
         
         # Default to conversation
         return {"intent": "conversation", "action": "respond_generally"}
     
-    def _is_daily_checkin(self, message: str) -> bool:
-        """Check if user is responding to daily reading"""
-        checkin_words = ["done", "finished", "read", "completed", "✓", "check"]
-        return any(word in message for word in checkin_words) and len(message.split()) < 5
-    
-    def _is_bookmark_request(self, message: str) -> bool:
-        bookmark_words = ["save", "bookmark", "remember this", "favorite"]
-        return any(word in message.lower() for word in bookmark_words)
+    def analyze_intents(self, messages: Iterable[str], chunk_size: int = 1000,
+                        processes: int = 0) -> Iterator[Dict[str, Any]]:
+        """Classify a stream of messages, yielding results in input order.
+        
+        Messages are consumed lazily in chunks. With processes > 0 the chunks
+        are classified in a process pool, keeping at most two chunks in flight
+        per worker so memory stays flat however long the stream is.
+        """
+        chunks = _chunked(messages, chunk_size)
+        if processes <= 0:
+            for chunk in chunks:
+                yield from (self.analyze_intent(message) for message in chunk)
+            return
+        
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_classify_chunk, chunk))
+                if len(pending) >= processes * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
     
     def _extract_verse_reference(self, message: str) -> Optional[str]:
         """Extract Bible verse reference from message"""
-        pattern = r'([1-3]?\s?[A-Za-z]+)\s*(\d+):(\d+(-\d+)?)'
-        match = re.search(pattern, message)
+        match = VERSE_REFERENCE_PATTERN.search(message)
         if match:
-            book = match.group(1).title()
+            book = match.group(1).strip().title()
             chapter = match.group(2)
             verse = match.group(3)
             return f"{book} {chapter}:{verse}"
         return None
     
     def _extract_topic(self, message: str) -> str:
-        """Extract main topic from message"""
-        # Remove common words
-        stop_words = ["i'm", "i am", "feeling", "about", "my", "me", "please", "can you"]
+        """Fallback topic when no known topic word matched: the first few content words"""
         words = message.lower().split()
-        filtered = [w for w in words if w not in stop_words]
-        
-        # Common topics mapping
-        topic_map = {
-            "anxious": "anxiety",
-            "worried": "anxiety",
-            "fear": "fear",
-            "scared": "fear",
-            "sad": "sadness",
-            "depressed": "depression",
-            "happy": "joy",
-            "joyful": "joy",
-            "angry": "anger",
-            "mad": "anger",
-            "tired": "weariness",
-            "stressed": "stress",
-            "peace": "peace",
-            "love": "love",
-            "hope": "hope",
-            "faith": "faith"
-        }
-        
-        for word in filtered:
-            if word in topic_map:
-                return topic_map[word]
-        
+        filtered = [w for w in words if w not in self.stop_words]
         return " ".join(filtered[:3]) if filtered else "encouragement"
     
-    def _detect_mood(self, message: str) -> str:
-        """Detect user mood from message"""
-        positive_words = ["happy", "joy", "blessed", "thankful", "grateful", "excited"]
-        negative_words = ["sad", "anxious", "worried", "afraid", "angry", "tired", "stressed"]
-        
-        if any(word in message for word in positive_words):
-            return "positive"
-        elif any(word in message for word in negative_words):
-            return "negative"
-        return "neutral"
-    
     def decide_action(self, intent_data: Dict[str, Any], user_data: Dict[str, Any]) -> str:
         """Decide which agent to call based on intent"""
         intent = intent_data.get("intent")
@@ -124,3 +213,21 @@ class PlannerAgent:
         }
         
         return action_map.get(intent, "response_composer")
+
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+_worker_planner: Optional[PlannerAgent] = None
+
+def _classify_chunk(messages: List[str]) -> List[Dict[str, Any]]:
+    """Process-pool entry point; each worker compiles its matcher once"""
+    global _worker_planner
+    if _worker_planner is None:
+        _worker_planner = PlannerAgent()
+    return [_worker_planner.analyze_intent(message) for message in messages]
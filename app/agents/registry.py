@@ -0,0 +1,151 @@
+import asyncio
+import gc
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.agents.planner import PlannerAgent
+from app.agents.bible_matcher import BibleMatchingAgent, DEFAULT_DATA_PATH
+from app.agents.response_composer import ResponseComposerAgent
+from app.agents.search import SearchIndex
+from app.cache import LRUCache
+
+CHAPTER_CACHE_SIZE = 512
+VERSE_RESPONSE_CACHE_SIZE = 256
+# Seconds between corpus file checks in each worker; 0 disables reloading
+RELOAD_INTERVAL = float(os.getenv("REGISTRY_RELOAD_INTERVAL", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRegistry:
+    """Process-wide set of stateless agents, shared read-only by all requests.
+
+    A registry is never mutated after construction, apart from the search
+    index it builds on first use. Reloading builds a new registry and swaps
+    the module-level reference, so requests already holding the old one
+    finish against a consistent corpus.
+    """
+
+    def __init__(self, data_path: Optional[Path] = None, version: int = 1):
+        self.data_path = Path(data_path) if data_path else DEFAULT_DATA_PATH
+        self.data_mtime = self._corpus_mtime()
+        self.version = version
+
+        self.planner = PlannerAgent()
+        self.bible_matcher = BibleMatchingAgent(self.data_path)
+        self.composer = ResponseComposerAgent()
+        # Inverted index for /bible/search, built on first use (about a second on a full corpus)
+        self._search_index: Optional[SearchIndex] = None
+        self._search_lock = threading.Lock()
+        # Pre-rendered chapter responses; dropped with the registry on reload
+        self.chapter_payloads = LRUCache(CHAPTER_CACHE_SIZE)
+        # Composed topic replies keyed (topic, limit, language, version)
+        self.verse_responses = LRUCache(VERSE_RESPONSE_CACHE_SIZE)
+
+    def _corpus_mtime(self) -> Tuple[Optional[float], ...]:
+        mtimes = []
+        for path in (self.data_path, self.data_path.with_suffix(".bin")):
+            try:
+                mtimes.append(path.stat().st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """The full-text index, built on the first search rather than during warm-up"""
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    self._search_index = SearchIndex(self.bible_matcher.verses)
+        return self._search_index
+
+    def verse_response(self, topic: str, limit: int = 3, language: str = "en") -> str:
+        """Composed VERSE reply for a topic; deterministic per corpus, so memoized"""
+        key = (topic, limit, language, self.version)
+        response = self.verse_responses.get(key)
+        if response is None:
+            verses = self.bible_matcher.find_verses_by_topic(topic, limit)
+            response = self.composer.compose_verse_response(verses, topic)
+            self.verse_responses.set(key, response)
+        return response
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "chapter_payloads": self.chapter_payloads.stats(),
+            "verse_responses": self.verse_responses.stats()
+        }
+
+    def data_changed(self) -> bool:
+        """Check whether the JSON corpus or its compiled store changed since this registry was loaded"""
+        return self._corpus_mtime() != self.data_mtime
+
+
+_registry: Optional[AgentRegistry] = None
+_lock = threading.Lock()
+
+
+def get_registry() -> AgentRegistry:
+    """Return the shared registry, loading it on first use"""
+    global _registry
+    registry = _registry
+    if registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = AgentRegistry()
+            registry = _registry
+    return registry
+
+
+def reload_registry(data_path: Optional[Path] = None) -> AgentRegistry:
+    """Build a fresh registry from disk and atomically swap it in"""
+    global _registry
+    with _lock:
+        previous = _registry
+        if data_path is None and previous is not None:
+            data_path = previous.data_path
+        version = previous.version + 1 if previous is not None else 1
+        _registry = AgentRegistry(data_path, version=version)
+        return _registry
+
+
+def reload_if_changed() -> bool:
+    """Reload the registry if the corpus file was modified; returns True on reload"""
+    if get_registry().data_changed():
+        reload_registry()
+        return True
+    return False
+
+
+def warm_up() -> AgentRegistry:
+    """Load the registry up front and exclude it from future GC passes.
+
+    Call this in the gunicorn master (with --preload) before workers fork.
+    Frozen objects are never touched by the collector, so their pages stay
+    shared copy-on-write between workers instead of being dirtied by GC.
+    """
+    registry = get_registry()
+    gc.collect()
+    gc.freeze()
+    return registry
+
+
+async def watch_corpus(interval: float = RELOAD_INTERVAL):
+    """Reload this process's registry whenever the corpus files change.
+
+    Every worker holds its own registry, so each runs this as a task from its
+    app lifespan; rebuilding data/ on disk then reaches all of them within
+    one interval.
+    """
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await asyncio.to_thread(reload_if_changed):
+                logger.info("Corpus changed on disk; registry reloaded (version %d)", get_registry().version)
+        except Exception:
+            logger.exception("Registry reload failed; still serving version %d", get_registry().version)
@@ -1,6 +1,14 @@
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import random
+from app import twiml
+
+FALLBACK_VERSES = {
+    "anxiety": "Cast all your anxiety on him because he cares for you. (1 Peter 5:7)",
+    "fear": "For God has not given us a spirit of fear, but of power and of love and of a sound mind. (2 Timothy 1:7)",
+    "encouragement": "The LORD himself goes before you and will be with you; he will never leave you nor forsake you. Do not be afraid; do not be discouraged. (Deuteronomy 31:8)"
+}
+DEFAULT_FALLBACK_VERSE = "Trust in the LORD with all your heart and lean not on your own understanding. (Proverbs 3:5)"
 
 class ResponseComposerAgent:
     def __init__(self):
@@ -17,6 +25,17 @@ class ResponseComposerAgent:
             "May God's peace be with you.",
             "Talk to you soon!"
         ]
+        
+        # Constant replies are built once: the same str objects are returned
+        # every time, and their TwiML is pre-rendered
+        self.greeting_messages = [self._greeting_text(greeting) for greeting in self.greetings]
+        self.fallback_messages = {topic: self._fallback_text(verse) for topic, verse in FALLBACK_VERSES.items()}
+        self.default_fallback_message = self._fallback_text(DEFAULT_FALLBACK_VERSE)
+        twiml.prerender(self.static_replies())
+    
+    def static_replies(self) -> List[str]:
+        """Every reply text that does not depend on the user or message"""
+        return self.greeting_messages + list(self.fallback_messages.values()) + [self.default_fallback_message]
     
     def compose_daily_reading_response(self, reading_data: Dict[str, Any], 
                                       user_stats: Dict[str, Any]) -> str:
@@ -54,20 +73,19 @@ Reply SKIP if today's not good.
         if not verses:
             return self._compose_fallback_response(topic)
         
-        response = f"📖 *Scripture for {topic.title()}*\n\n"
-        
+        parts = [f"📖 *Scripture for {topic.title()}*\n\n"]
         for i, verse in enumerate(verses, 1):
-            response += f"{i}. *{verse['book']} {verse['chapter']}:{verse['verse']}*\n"
-            response += f"_{verse['text']}_\n\n"
-        
-        response += "💭 *Reflection:* How does this speak to your situation?\n\n"
-        response += "💬 Reply with your thoughts, or type MENU for options."
+            parts.append(f"{i}. *{verse['book']} {verse['chapter']}:{verse['verse']}*\n_{verse['text']}_\n\n")
+        parts.append("💭 *Reflection:* How does this speak to your situation?\n\n"
+                     "💬 Reply with your thoughts, or type MENU for options.")
         
-        return response
+        return "".join(parts)
     
     def compose_greeting(self) -> str:
         """Compose greeting message"""
-        greeting = random.choice(self.greetings)
+        return random.choice(self.greeting_messages)
+    
+    def _greeting_text(self, greeting: str) -> str:
         return f"""{greeting}
 
 I'm your Bible Study Companion! 🤖
@@ -108,14 +126,9 @@ Keep treasuring God's Word in your heart! 💖"""
     
     def _compose_fallback_response(self, topic: str) -> str:
         """Compose response when no verses found"""
-        fallbacks = {
-            "anxiety": "Cast all your anxiety on him because he cares for you. (1 Peter 5:7)",
-            "fear": "For God has not given us a spirit of fear, but of power and of love and of a sound mind. (2 Timothy 1:7)",
-            "encouragement": "The LORD himself goes before you and will be with you; he will never leave you nor forsake you. Do not be afraid; do not be discouraged. (Deuteronomy 31:8)"
-        }
-        
-        verse = fallbacks.get(topic, "Trust in the LORD with all your heart and lean not on your own understanding. (Proverbs 3:5)")
-        
+        return self.fallback_messages.get(topic, self.default_fallback_message)
+    
+    def _fallback_text(self, verse: str) -> str:
         return f"""📖 *Encouragement for You*
 
 {verse}
@@ -1,94 +1,400 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import logging
-from typing import Dict, Any
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, Any, Iterable, Iterator, List, Optional, Set
+from sqlalchemy import delete, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app import models
+from app.database import SessionLocal, engine
+from app.agents.memory import MemoryAgent
 
-logging.basicConfig()
-logging.getLogger('apscheduler').setLevel(logging.DEBUG)
+# APScheduler and the HTTP sender load only when a scheduler is started, off the cold-start path
+if TYPE_CHECKING:
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from app.agents.sender import WhatsAppSender
+
+logger = logging.getLogger(__name__)
+
+REMINDER_PAGE_SIZE = int(os.getenv("REMINDER_PAGE_SIZE", "500"))
+SEND_WORKERS = int(os.getenv("REMINDER_SEND_WORKERS", "8"))
+# How far back a (re)started scheduler looks for buckets it missed
+CATCHUP_MINUTES = int(os.getenv("REMINDER_CATCHUP_MINUTES", "120"))
+# A user is reminded at most once per interval, whichever bucket or job sends it
+REMINDER_INTERVAL = timedelta(hours=20)
+
+LEASE_NAME = "scheduler"
+LEASE_TTL = timedelta(seconds=int(os.getenv("SCHEDULER_LEASE_TTL", "60")))
+LEASE_RENEW = LEASE_TTL / 4
+# APScheduler still starts a run this many seconds after its scheduled time, then drops it
+MISFIRE_GRACE_TIME = 300
+_worker_ids: Dict[int, str] = {}
+
+# job id -> (SchedulerAgent method, CronTrigger fields, description)
+JOBS = {
+    # Daily reminders, delivered per minute bucket of each user's preferred_time
+    "due_reminders": ("send_due_reminders", {"minute": "*"}, "Send Bible study reminders due this minute"),
+    # Re-derive UTC buckets for users whose timezone shifts with DST
+    "refresh_reminder_buckets": ("refresh_reminder_buckets", {"hour": 0, "minute": 5}, "Refresh reminder minute buckets"),
+    "prune_job_runs": ("prune_job_runs", {"hour": 0, "minute": 15}, "Delete old job run claims"),
+    "prune_processed_messages": ("prune_processed_messages", {"hour": 0, "minute": 20}, "Delete old webhook MessageSid records"),
+    # Evening check-in (8 PM)
+    "evening_checkin": ("send_evening_checkins", {"hour": 20, "minute": 0}, "Send evening check-in messages"),
+    # Weekly progress report (Sunday 9 AM)
+    "weekly_report": ("send_weekly_reports", {"day_of_week": "sun", "hour": 9, "minute": 0}, "Send weekly progress reports"),
+}
+
+# The leader's sender, shared by job runs so they reuse its connection pool
+_job_sender: Optional["WhatsAppSender"] = None
+
+# Everything the reminder and MemoryAgent.stats_for_user read from a user
+REMINDER_COLUMNS = (
+    models.User.id,
+    models.User.phone_number,
+    models.User.current_book,
+    models.User.last_chapter,
+    models.User.total_days_engaged,
+    models.User.current_streak,
+    models.User.chapters_read,
+    models.User.total_bookmarks,
+)
+
+def worker_id() -> str:
+    """Lease owner id for this process (computed per pid, so forked gunicorn workers differ)"""
+    pid = os.getpid()
+    if pid not in _worker_ids:
+        _worker_ids[pid] = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+    return _worker_ids[pid]
+
+def acquire_lease(owner: str, name: str = LEASE_NAME) -> bool:
+    """Take or renew the named lease; True while this owner holds it"""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        renewed = db.execute(
+            update(models.SchedulerLease)
+            .where(
+                models.SchedulerLease.name == name,
+                or_(models.SchedulerLease.owner == owner, models.SchedulerLease.expires_at < now)
+            )
+            .values(owner=owner, expires_at=now + LEASE_TTL)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if renewed:
+            return True
+        try:
+            db.add(models.SchedulerLease(name=name, owner=owner, expires_at=now + LEASE_TTL))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+    finally:
+        db.close()
+
+def release_lease(owner: str, name: str = LEASE_NAME):
+    """Expire the lease now so another worker can take over without waiting out the TTL"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(models.SchedulerLease)
+            .where(models.SchedulerLease.name == name, models.SchedulerLease.owner == owner)
+            .values(expires_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def claim_occurrence(db: Session, job_id: str, scheduled_for: datetime, owner: str) -> Optional[datetime]:
+    """Record this occurrence as ours; returns the previous occurrence's time, or None if already claimed.
+    
+    The previous time is scheduled_for itself when the job has never run before.
+    """
+    previous = db.query(func.max(models.JobRun.scheduled_for)).filter(
+        models.JobRun.job_id == job_id,
+        models.JobRun.scheduled_for < scheduled_for
+    ).scalar()
+    try:
+        db.add(models.JobRun(job_id=job_id, scheduled_for=scheduled_for, owner=owner))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    return previous or scheduled_for
+
+def scheduled_occurrence(job_id: str, now: Optional[datetime] = None) -> datetime:
+    """UTC time (naive) of the job's latest scheduled run at or before now: the one APScheduler is running.
+    
+    Derived from the job's trigger rather than the wall clock, so a run that
+    starts late, or on a worker that took over the lease, claims the same
+    occurrence as an on-time run.
+    """
+    from apscheduler.triggers.cron import CronTrigger
+    
+    trigger = CronTrigger(**JOBS[job_id][1])
+    now = now or datetime.now(timezone.utc)
+    occurrence = None
+    fire_time = trigger.get_next_fire_time(None, now - timedelta(seconds=2 * MISFIRE_GRACE_TIME))
+    while fire_time is not None and fire_time <= now:
+        occurrence = fire_time
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+    if occurrence is None:
+        # Started by hand (or later than APScheduler would allow): key it on the current minute
+        return now.astimezone(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+    return occurrence.astimezone(timezone.utc).replace(tzinfo=None)
+
+def run_job(job_id: str):
+    """Entry point for every scheduled job (referenced by name from the persistent job store)"""
+    scheduled_for = scheduled_occurrence(job_id)
+    db = SessionLocal()
+    try:
+        previous = claim_occurrence(db, job_id, scheduled_for, worker_id())
+        if previous is None:
+            logger.info("Job %s at %s already ran on another worker", job_id, scheduled_for)
+            return
+        agent = SchedulerAgent(db, sender=_job_sender)
+        if job_id == "due_reminders" and previous < scheduled_for:
+            agent._last_reminder_tick = previous
+        getattr(agent, JOBS[job_id][0])()
+    finally:
+        db.close()
 
 class SchedulerAgent:
-    def __init__(self, db: Session):
-        self.scheduler = BackgroundScheduler()
+    def __init__(self, db: Session, sender: Optional["WhatsAppSender"] = None):
+        from app.agents.sender import WhatsAppSender
+        
+        self.scheduler: Optional["BackgroundScheduler"] = None
         self.db = db
-        self.setup_schedules()
+        # None when TWILIO_* is not configured: messages are only logged
+        self.sender = sender or WhatsAppSender.from_env(workers=SEND_WORKERS)
+        # Last minute the due-reminder job covered; None means catch up CATCHUP_MINUTES
+        self._last_reminder_tick: Optional[datetime] = None
+        self._lease_thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
     
     def setup_schedules(self):
-        """Setup all scheduled tasks"""
-        # Morning reminder (8 AM)
-        self.scheduler.add_job(
-            self.send_morning_reminders,
-            CronTrigger(hour=8, minute=0),
-            id='morning_reminder',
-            name='Send morning Bible study reminders'
-        )
+        """Register every job in the persistent job store, replacing older definitions"""
+        from apscheduler.triggers.cron import CronTrigger
         
-        # Evening check-in (8 PM)
-        self.scheduler.add_job(
-            self.send_evening_checkins,
-            CronTrigger(hour=20, minute=0),
-            id='evening_checkin',
-            name='Send evening check-in messages'
-        )
+        for job_id, (_, fields, name) in JOBS.items():
+            self.scheduler.add_job(
+                "app.agents.scheduler:run_job",
+                CronTrigger(**fields),
+                args=[job_id],
+                id=job_id,
+                name=name,
+                replace_existing=True
+            )
+    
+    def send_due_reminders(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Send reminders to users whose preferred time falls in the minutes since the last run.
         
-        # Weekly progress report (Sunday 9 AM)
-        self.scheduler.add_job(
-            self.send_weekly_reports,
-            CronTrigger(day_of_week='sun', hour=9, minute=0),
-            id='weekly_report',
-            name='Send weekly progress reports'
+        After a restart or a missed tick the window reaches back up to
+        CATCHUP_MINUTES. Each user is claimed by stamping last_reminder_at
+        before sending, so a bucket that is covered twice sends once.
+        """
+        now = (now or datetime.utcnow()).replace(second=0, microsecond=0)
+        oldest = now - timedelta(minutes=CATCHUP_MINUTES)
+        start = oldest if self._last_reminder_tick is None else max(
+            self._last_reminder_tick + timedelta(minutes=1), oldest
         )
+        minutes = []
+        tick = start
+        while tick <= now:
+            minutes.append(tick.hour * 60 + tick.minute)
+            tick += timedelta(minutes=1)
+        
+        totals = self._deliver_reminders(self._due_pages(minutes, REMINDER_PAGE_SIZE, now), now)
+        self._last_reminder_tick = now
+        return totals
     
-    def send_morning_reminders(self):
-        """Send morning reminders to all users"""
-        from app.agents.planner import PlannerAgent
-        from app.agents.bible_matcher import BibleMatchingAgent
-        from app.agents.response_composer import ResponseComposerAgent
+    def send_morning_reminders(self) -> Dict[str, Any]:
+        """Send a reminder now to every opted-in user not reminded in the last REMINDER_INTERVAL"""
+        now = datetime.utcnow()
+        return self._deliver_reminders(self._reminder_pages(REMINDER_PAGE_SIZE), now)
+    
+    def refresh_reminder_buckets(self) -> int:
+        """Recompute reminder_minute for users outside UTC, so DST changes move their bucket"""
+        today = datetime.utcnow().date()
+        last_id = updated = 0
+        while True:
+            page = self.db.query(
+                models.User.id, models.User.preferred_time, models.User.timezone, models.User.reminder_minute
+            ).filter(
+                models.User.timezone != "UTC",
+                models.User.id > last_id
+            ).order_by(models.User.id).limit(REMINDER_PAGE_SIZE).all()
+            if not page:
+                return updated
+            last_id = page[-1].id
+            changes = []
+            for row in page:
+                minute = models.reminder_minute(row.preferred_time, row.timezone, today)
+                if minute != row.reminder_minute:
+                    changes.append({"id": row.id, "reminder_minute": minute})
+            if changes:
+                self.db.execute(update(models.User), changes)
+                self.db.commit()
+                updated += len(changes)
+    
+    def _deliver_reminders(self, pages: Iterable[List[Any]], now: datetime) -> Dict[str, Any]:
+        """Claim, compose, send and log reminders page by page.
         
-        # Get all users who want reminders
-        users = self.db.query(models.User).filter(
-            models.User.receive_daily_reminders == True
-        ).all()
+        Each page is sent through a pool of SEND_WORKERS threads and its
+        reminder logs are bulk-inserted with one commit. A claim is not
+        released if the send fails, so delivery is at most once per interval.
+        """
+        from app.agents.registry import get_registry
         
-        planner = PlannerAgent()
-        bible_matcher = BibleMatchingAgent()
-        composer = ResponseComposerAgent()
+        registry = get_registry()
+        bible_matcher = registry.bible_matcher
+        composer = registry.composer
         
-        for user in users:
-            try:
-                # Get today's reading
-                reading_data = bible_matcher.get_daily_reading(
-                    user.current_book, 
-                    user.last_chapter
-                )
-                
-                # Generate reflection question
-                reading_data['reflection_question'] = bible_matcher.generate_reflection_question(
-                    reading_data['book'], 
-                    reading_data['chapter_start']
-                )
-                
-                # Get user stats
-                memory_agent = MemoryAgent(self.db)
-                stats = memory_agent.get_user_stats(user.id)
+        started = time.monotonic()
+        totals = {"users": 0, "sent": 0, "failed": 0, "skipped": 0}
+        with ThreadPoolExecutor(max_workers=SEND_WORKERS, thread_name_prefix="reminder-send") as pool:
+            for page in pages:
+                claimed = self._claim_reminders([user.id for user in page], now)
+                totals["skipped"] += len(page) - len(claimed)
+                jobs = []
+                for user in page:
+                    if user.id not in claimed:
+                        continue
+                    # Get today's reading
+                    reading_data = bible_matcher.get_daily_reading(
+                        user.current_book, 
+                        user.last_chapter
+                    )
+                    
+                    # Generate reflection question
+                    reading_data['reflection_question'] = bible_matcher.generate_reflection_question(
+                        reading_data['book'], 
+                        reading_data['chapter_start']
+                    )
+                    
+                    # Stats come from the counters on the page row, no extra queries
+                    stats = MemoryAgent.stats_for_user(user)
+                    message = composer.compose_daily_reading_response(reading_data, stats)
+                    jobs.append((user, reading_data, message))
                 
-                # Compose message
-                message = composer.compose_daily_reading_response(reading_data, stats)
+                results = pool.map(self._send_reminder, jobs)
+                logs = []
+                for (user, reading_data, _), sent in zip(jobs, results):
+                    if not sent:
+                        totals["failed"] += 1
+                        continue
+                    totals["sent"] += 1
+                    logs.append({
+                        "user_id": user.id,
+                        "message_type": "system_reminder",
+                        "content": f"Morning reminder sent: {reading_data['book']} {reading_data['chapter_start']}-{reading_data['chapter_end']}",
+                        "intent": "daily_reminder",
+                        "message_metadata": {},
+                        "created_at": datetime.utcnow()
+                    })
+                self._log_reminders(logs)
+                totals["users"] += len(jobs)
                 
-                # Send message (implement WhatsApp sending)
-                self.send_whatsapp_message(user.phone_number, message)
-                
-                # Log the reminder
-                memory_agent.save_conversation(
-                    user.id,
-                    "system_reminder",
-                    f"Morning reminder sent: {reading_data['book']} {reading_data['chapter_start']}-{reading_data['chapter_end']}",
-                    "daily_reminder"
+                elapsed = time.monotonic() - started
+                logger.info(
+                    "Reminders: %d users, %d sent, %d failed, %.0f users/s",
+                    totals["users"], totals["sent"], totals["failed"],
+                    totals["users"] / elapsed if elapsed else 0.0
                 )
-                
-            except Exception as e:
-                print(f"Error sending reminder to {user.phone_number}: {e}")
+        
+        elapsed = time.monotonic() - started
+        totals["seconds"] = round(elapsed, 2)
+        totals["users_per_second"] = round(totals["users"] / elapsed, 1) if elapsed else 0.0
+        if totals["users"] or totals["skipped"]:
+            logger.info("Reminders finished: %s", totals)
+        return totals
+    
+    def _reminder_pages(self, page_size: int) -> Iterator[List[Any]]:
+        """Stream opted-in users in primary-key order, only the columns the reminder needs"""
+        last_id = 0
+        while True:
+            page = self.db.query(*REMINDER_COLUMNS).filter(
+                models.User.receive_daily_reminders == True,
+                models.User.id > last_id
+            ).order_by(models.User.id).limit(page_size).all()
+            if not page:
+                return
+            yield page
+            last_id = page[-1].id
+    
+    def _due_pages(self, minutes: List[int], page_size: int, now: datetime) -> Iterator[List[Any]]:
+        """Opted-in users not yet reminded, bucket by bucket along ix_users_reminder_minute_id"""
+        cutoff = now - REMINDER_INTERVAL
+        for minute in minutes:
+            last_id = 0
+            while True:
+                page = self.db.query(*REMINDER_COLUMNS).filter(
+                    models.User.reminder_minute == minute,
+                    models.User.id > last_id,
+                    models.User.receive_daily_reminders == True,
+                    or_(models.User.last_reminder_at.is_(None), models.User.last_reminder_at < cutoff)
+                ).order_by(models.User.id).limit(page_size).all()
+                if not page:
+                    break
+                yield page
+                last_id = page[-1].id
+    
+    def _claim_reminders(self, user_ids: List[int], now: datetime) -> Set[int]:
+        """Stamp last_reminder_at on users not reminded within REMINDER_INTERVAL; returns the ids claimed"""
+        if not user_ids:
+            return set()
+        cutoff = now - REMINDER_INTERVAL
+        claimed = self.db.execute(
+            update(models.User)
+            .where(
+                models.User.id.in_(user_ids),
+                or_(models.User.last_reminder_at.is_(None), models.User.last_reminder_at < cutoff)
+            )
+            .values(last_reminder_at=now)
+            .returning(models.User.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        self.db.commit()
+        return set(claimed)
+    
+    def _send_reminder(self, job) -> bool:
+        user, _, message = job
+        try:
+            self.send_whatsapp_message(user.phone_number, message)
+            return True
+        except Exception:
+            logger.exception("Error sending reminder to %s", user.phone_number)
+            return False
+    
+    def _log_reminders(self, rows: List[Dict[str, Any]]):
+        """One INSERT ... executemany and one commit per page"""
+        if not rows:
+            return
+        self.db.execute(insert(models.Conversation), rows)
+        self.db.commit()
+    
+    def prune_job_runs(self, keep: timedelta = timedelta(days=7)) -> int:
+        """Delete occurrence claims older than `keep`"""
+        deleted = self.db.execute(
+            delete(models.JobRun).where(models.JobRun.scheduled_for < datetime.utcnow() - keep)
+        ).rowcount
+        self.db.commit()
+        return deleted
+    
+    def prune_processed_messages(self, keep: timedelta = timedelta(days=2)) -> int:
+        """Delete MessageSid records older than `keep`; Twilio stops retrying long before that"""
+        deleted = self.db.execute(
+            delete(models.ProcessedMessage).where(models.ProcessedMessage.created_at < datetime.utcnow() - keep)
+        ).rowcount
+        self.db.commit()
+        return deleted
     
     def send_evening_checkins(self):
         """Send evening check-in messages"""
@@ -100,16 +406,67 @@ class SchedulerAgent:
         pass
     
     def send_whatsapp_message(self, phone_number: str, message: str):
-        """Send WhatsApp message (to be implemented with Twilio)"""
-        # This will be implemented in the WhatsApp routes
-        print(f"[SCHEDULED] To {phone_number}: {message[:50]}...")
+        """Send a WhatsApp message through the pooled, rate-limited sender (raises SendError)"""
+        if self.sender is None:
+            logger.info("[SCHEDULED] To %s: %s...", phone_number, message[:50])
+            return
+        self.sender.send(phone_number, message)
     
     def start(self):
-        """Start the scheduler"""
-        self.scheduler.start()
-        print("Scheduler started")
+        """Join leader election; the worker holding the lease runs the jobs.
+        
+        Every worker calls this. A background thread renews the lease every
+        LEASE_RENEW seconds; a follower takes over once the leader's lease
+        has been expired for LEASE_TTL, e.g. after the leader crashed.
+        """
+        global _job_sender
+        _job_sender = self.sender
+        self._stopping.clear()
+        self._lease_thread = threading.Thread(target=self._lease_loop, name="scheduler-lease", daemon=True)
+        self._lease_thread.start()
     
     def shutdown(self):
-        """Shutdown the scheduler"""
-        self.scheduler.shutdown()
-        print("Scheduler stopped")
+        """Stop running jobs and hand the lease over"""
+        self._stopping.set()
+        if self._lease_thread is not None:
+            self._lease_thread.join(timeout=5)
+            self._lease_thread = None
+        if self.scheduler is not None:
+            self._stop_jobs()
+            release_lease(worker_id())
+        if self.sender is not None:
+            self.sender.close()
+    
+    @property
+    def is_leader(self) -> bool:
+        return self.scheduler is not None
+    
+    def _lease_loop(self):
+        while not self._stopping.is_set():
+            try:
+                leader = acquire_lease(worker_id())
+            except Exception:
+                logger.exception("Scheduler lease check failed")
+                leader = False
+            if leader and self.scheduler is None:
+                self._start_jobs()
+            elif not leader and self.scheduler is not None:
+                self._stop_jobs()
+            self._stopping.wait(LEASE_RENEW.total_seconds())
+    
+    def _start_jobs(self):
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        from apscheduler.schedulers.background import BackgroundScheduler
+        
+        self.scheduler = BackgroundScheduler(
+            jobstores={"default": SQLAlchemyJobStore(engine=engine, tablename="apscheduler_jobs")},
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": MISFIRE_GRACE_TIME}
+        )
+        self.setup_schedules()
+        self.scheduler.start()
+        logger.info("Scheduler started on %s (leader)", worker_id())
+    
+    def _stop_jobs(self):
+        self.scheduler.shutdown(wait=False)
+        self.scheduler = None
+        logger.info("Scheduler stopped on %s", worker_id())
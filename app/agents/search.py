@@ -0,0 +1,175 @@
+import heapq
+import math
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+from app.agents.verse_store import VerseStore
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    """Inverted index over a verse store with BM25 ranking.
+
+    Postings live in flat arrays laid out CSR-style: the postings for term t
+    are post_docs[doc_starts[t]:doc_starts[t + 1]], and the word positions for
+    posting p are positions[pos_starts[p]:pos_starts[p + 1]]. The BM25
+    contribution of every posting is precomputed into post_impact, so query
+    time is just summing impacts.
+    Terms are sorted, so a term id is also its rank and prefix queries are a
+    bisect over self.terms.
+
+    Query syntax: plain words are ranked disjunctively, "quoted phrases" must
+    appear verbatim, and a trailing * makes a word a prefix (e.g. lov*).
+    """
+
+    def __init__(self, verses: VerseStore, k1: float = 1.2, b: float = 0.75):
+        self.verses = verses
+
+        postings: Dict[str, Dict[int, List[int]]] = {}
+        doc_lengths = array("H")
+        for doc in range(len(verses)):
+            tokens = tokenize(verses.text(doc))
+            doc_lengths.append(len(tokens))
+            for position, token in enumerate(tokens):
+                postings.setdefault(token, {}).setdefault(doc, []).append(position)
+
+        self.doc_count = len(verses)
+        avg_doc_length = (sum(doc_lengths) / self.doc_count) if self.doc_count else 1.0
+
+        self.terms: Tuple[str, ...] = tuple(sorted(postings))
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+        self.doc_starts = array("I", [0])
+        self.post_docs = array("I")
+        self.post_impact = array("f")
+        self.pos_starts = array("I", [0])
+        self.positions = array("H")
+        for term in self.terms:
+            term_postings = postings.pop(term)
+            df = len(term_postings)
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            for doc, doc_positions in term_postings.items():
+                tf = len(doc_positions)
+                norm = tf + k1 * (1 - b + b * doc_lengths[doc] / avg_doc_length)
+                self.post_docs.append(doc)
+                self.post_impact.append(idf * tf * (k1 + 1) / norm)
+                self.positions.extend(doc_positions)
+                self.pos_starts.append(len(self.positions))
+            self.doc_starts.append(len(self.post_docs))
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the index structures"""
+        arrays = (self.doc_starts, self.post_docs, self.post_impact, self.pos_starts, self.positions)
+        size = sum(a.itemsize * len(a) for a in arrays)
+        size += sys.getsizeof(self.terms) + sys.getsizeof(self.term_ids)
+        size += sum(sys.getsizeof(term) for term in self.terms)
+        return size
+
+    def search(self, query: str, page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+        """Rank verses for a query and return one page of results"""
+        page = max(page, 1)
+        page_size = max(page_size, 1)
+        scores = self._score(query)
+
+        top = heapq.nlargest(page * page_size, scores.items(), key=lambda item: (item[1], -item[0]))
+        results = []
+        for doc, score in top[(page - 1) * page_size:]:
+            verse = self.verses[doc]
+            verse["reference"] = f"{verse['book']} {verse['chapter']}:{verse['verse']}"
+            verse["score"] = round(score, 4)
+            results.append(verse)
+
+        return {
+            "query": query,
+            "total": len(scores),
+            "page": page,
+            "page_size": page_size,
+            "results": results
+        }
+
+    def _score(self, query: str) -> Dict[int, float]:
+        phrases: List[List[int]] = []
+        term_ids: List[int] = []
+        for phrase, word in QUERY_PATTERN.findall(query.lower()):
+            if phrase:
+                ids = [self.term_ids.get(token, -1) for token in tokenize(phrase)]
+                if not ids:
+                    continue
+                if -1 in ids:
+                    # A phrase with an unknown word can never match
+                    return {}
+                phrases.append(ids)
+            elif word.endswith("*"):
+                term_ids.extend(self._expand_prefix(word.rstrip("*")))
+            else:
+                term_ids.extend(self.term_ids[token] for token in tokenize(word) if token in self.term_ids)
+
+        required = None
+        for ids in phrases:
+            matches = self._phrase_docs(ids)
+            required = matches if required is None else required & matches
+            term_ids.extend(ids)
+        if required is not None and not required:
+            return {}
+
+        scores: Dict[int, float] = {}
+        for term_id in dict.fromkeys(term_ids):
+            self._accumulate(term_id, scores, required)
+        return scores
+
+    def _expand_prefix(self, prefix: str) -> List[int]:
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        prefix = tokens[0]
+        start = bisect_left(self.terms, prefix)
+        end = start
+        while end < len(self.terms) and end - start < MAX_PREFIX_EXPANSIONS and self.terms[end].startswith(prefix):
+            end += 1
+        return list(range(start, end))
+
+    def _accumulate(self, term_id: int, scores: Dict[int, float], required=None):
+        start, end = self.doc_starts[term_id], self.doc_starts[term_id + 1]
+        docs = self.post_docs[start:end]
+        impacts = self.post_impact[start:end]
+        if required is None:
+            get = scores.get
+            for doc, impact in zip(docs, impacts):
+                scores[doc] = get(doc, 0.0) + impact
+        else:
+            for doc, impact in zip(docs, impacts):
+                if doc in required:
+                    scores[doc] = scores.get(doc, 0.0) + impact
+
+    def _doc_positions(self, term_id: int) -> Dict[int, Tuple[int, int]]:
+        start, end = self.doc_starts[term_id], self.doc_starts[term_id + 1]
+        return {self.post_docs[p]: (self.pos_starts[p], self.pos_starts[p + 1]) for p in range(start, end)}
+
+    def _phrase_docs(self, ids: List[int]) -> set:
+        """Documents where the terms occur at consecutive positions"""
+        per_term = [self._doc_positions(term_id) for term_id in ids]
+        candidates = set(min(per_term, key=len))
+        for doc_map in per_term:
+            candidates.intersection_update(doc_map)
+
+        matches = set()
+        for doc in candidates:
+            first_start, first_end = per_term[0][doc]
+            starts = set(self.positions[first_start:first_end])
+            for offset, doc_map in enumerate(per_term[1:], 1):
+                lo, hi = doc_map[doc]
+                starts &= {pos - offset for pos in self.positions[lo:hi]}
+                if not starts:
+                    break
+            if starts:
+                matches.add(doc)
+        return matches
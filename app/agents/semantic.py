@@ -0,0 +1,227 @@
+"""Latent semantic index for free-text topics.
+
+Verses are embedded offline with LSA: sublinear TF-IDF over lightly stemmed
+words, reduced to DIMENSIONS with a randomized truncated SVD. The build
+writes three files next to the corpus:
+
+    bible_verses.lsa.docs.npy    float32[verses, dim]  unit-length verse vectors
+    bible_verses.lsa.terms.npy   float32[terms, dim]   idf-scaled term projections
+    bible_verses.lsa.vocab.json  stemmed vocabulary, in terms.npy row order
+
+At runtime both matrices are memory-mapped (shared page cache across
+workers). A topic is folded into the same space by summing its terms' rows
+and ranked with one matrix-vector product against the verse matrix.
+
+NumPy is optional and imported by open() or build(), not at module import,
+so it stays off the cold-start path. Without it open() returns None and
+topics outside the curated index fall back to the composed default reply.
+Build with:
+
+    python -m app.agents.semantic [data/bible_verses.json] [--processes N]
+"""
+import argparse
+import json
+import math
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.agents.search import tokenize
+from app.agents.verse_store import VerseStore
+
+# Bound by _load_numpy() on first use
+np = None
+
+DIMENSIONS = 64
+# Below this cosine a topic is considered unrelated to every verse
+MIN_SCORE = 0.15
+SUFFIXES = ("fulness", "ness", "ful", "ing", "ed", "ly", "es", "s")
+
+# Planner topics whose own word rarely occurs in scripture, widened with the words that do
+TOPIC_QUERIES = {
+    "sadness": "sadness sorrow grief mourn weep tears comfort",
+    "depression": "despair downcast soul broken hope lift",
+    "joy": "joy rejoice glad gladness delight",
+    "anger": "anger wrath angry slow patience",
+    "weariness": "weary tired rest strength renew burden",
+    "stress": "trouble burden cares anxious rest peace",
+}
+
+def _load_numpy() -> bool:
+    """Import numpy into this module once; False when it is not installed"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - numpy is an optional dependency
+            return False
+        np = numpy
+    return True
+
+def stem(token: str) -> str:
+    """Crude suffix stripping so weary/weariness and sad/sadness share a term"""
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    return token[:-1] + "i" if token.endswith("y") else token
+
+def terms(text: str) -> List[str]:
+    return [stem(token) for token in tokenize(text)]
+
+def paths_for(data_path: Path) -> Tuple[Path, Path, Path]:
+    base = data_path.with_suffix("")
+    return (
+        base.with_name(base.name + ".lsa.docs.npy"),
+        base.with_name(base.name + ".lsa.terms.npy"),
+        base.with_name(base.name + ".lsa.vocab.json"),
+    )
+
+class SemanticIndex:
+    """Memory-mapped LSA verse embeddings with topic fold-in"""
+
+    def __init__(self, doc_vectors, term_vectors, vocabulary: Sequence[str]):
+        self.doc_vectors = doc_vectors
+        self.term_vectors = term_vectors
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(vocabulary)}
+
+    @classmethod
+    def open(cls, data_path: Path, verse_count: Optional[int] = None) -> Optional["SemanticIndex"]:
+        """Map a built index, or None if numpy is missing or the files are absent, stale or mismatched"""
+        if not _load_numpy():
+            return None
+        docs_path, terms_path, vocab_path = paths_for(Path(data_path))
+        try:
+            if Path(data_path).exists() and docs_path.stat().st_mtime < Path(data_path).stat().st_mtime:
+                return None
+            with open(vocab_path, "r", encoding="utf-8") as f:
+                vocabulary = json.load(f)["terms"]
+            doc_vectors = np.load(docs_path, mmap_mode="r")
+            term_vectors = np.load(terms_path, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+        if verse_count is not None and doc_vectors.shape[0] != verse_count:
+            return None
+        return cls(doc_vectors, term_vectors, vocabulary)
+
+    def embed(self, text: str):
+        """Fold free text into the verse space; None when no word is known"""
+        counts = Counter(term_id for term_id in map(self.term_ids.get, terms(text)) if term_id is not None)
+        if not counts:
+            return None
+        ids = list(counts)
+        weights = np.array([1 + math.log(counts[i]) for i in ids], dtype=np.float32)
+        vector = weights @ self.term_vectors[ids]
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def top_verses(self, topic: str, k: int = 3, min_score: float = MIN_SCORE) -> List[Tuple[int, float]]:
+        """(verse index, cosine) for the k verses closest to a topic, best first"""
+        vector = self.embed(TOPIC_QUERIES.get(topic, topic))
+        if vector is None:
+            return []
+        scores = self.doc_vectors @ vector
+        k = min(k, scores.shape[0])
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] >= min_score]
+
+def _count_terms(texts: Sequence[str]) -> List[Dict[str, int]]:
+    return [Counter(terms(text)) for text in texts]
+
+def _row_products(indptr, indices, data, matrix, chunk: int = 4096):
+    """A @ matrix for a CSR matrix A, in row chunks to bound the temporary"""
+    out = np.zeros((len(indptr) - 1, matrix.shape[1]), dtype=np.float32)
+    for start in range(0, len(indptr) - 1, chunk):
+        stop = min(start + chunk, len(indptr) - 1)
+        lo, hi = indptr[start], indptr[stop]
+        if lo == hi:
+            continue
+        products = data[lo:hi, None] * matrix[indices[lo:hi]]
+        rows = np.repeat(np.arange(start, stop), np.diff(indptr[start:stop + 1]))
+        # rows is sorted, so each row's products are contiguous: one reduceat per chunk
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        out[rows[starts]] = np.add.reduceat(products, starts, axis=0)
+    return out
+
+def build(data_path: Path, processes: int = 0, dimensions: int = DIMENSIONS, seed: int = 0) -> int:
+    """Build the LSA files for a bible_verses.json corpus; returns the verse count"""
+    if not _load_numpy():
+        raise RuntimeError("numpy is required to build the semantic index")
+    with open(data_path, "r", encoding="utf-8") as f:
+        # Row i must be verse i of the store, which groups verses by book and chapter
+        store = VerseStore.from_verses(json.load(f).get("verses", []))
+    texts = [store.text(i) for i in range(len(store))]
+
+    # Tokenizing and counting is the Python-bound part; spread it over processes
+    processes = processes or os.cpu_count() or 1
+    chunk_size = max(1, math.ceil(len(texts) / (processes * 4)))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if processes > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            counted = [doc for part in pool.map(_count_terms, chunks) for doc in part]
+    else:
+        counted = _count_terms(texts)
+
+    vocabulary = sorted({term for doc in counted for term in doc})
+    term_ids = {term: i for i, term in enumerate(vocabulary)}
+    indptr = np.zeros(len(counted) + 1, dtype=np.int64)
+    indices, tfs = [], []
+    for row, doc in enumerate(counted):
+        indices.extend(term_ids[term] for term in doc)
+        tfs.extend(doc.values())
+        indptr[row + 1] = len(indices)
+    indices = np.asarray(indices, dtype=np.int64)
+    data = 1 + np.log(np.asarray(tfs, dtype=np.float32))
+
+    # Sublinear TF-IDF with unit-length rows
+    df = np.bincount(indices, minlength=len(vocabulary))
+    idf = (np.log((1 + len(counted)) / (1 + df)) + 1).astype(np.float32)
+    data *= idf[indices]
+    rows = np.repeat(np.arange(len(counted)), np.diff(indptr))
+    norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(counted))).astype(np.float32)
+    data /= np.maximum(norms, 1e-12)[rows]
+
+    # Transposed (CSC) copy for A.T @ X
+    order = np.argsort(indices, kind="stable")
+    t_indptr = np.concatenate(([0], np.cumsum(df)))
+    t_indices, t_data = rows[order], data[order]
+
+    # Randomized truncated SVD (Halko et al.) with two power iterations
+    k = max(1, min(dimensions, len(vocabulary) - 1, len(counted) - 1))
+    rng = np.random.default_rng(seed)
+    basis = _row_products(indptr, indices, data, rng.standard_normal((len(vocabulary), k + 10)).astype(np.float32))
+    for _ in range(2):
+        basis, _ = np.linalg.qr(basis)
+        basis, _ = np.linalg.qr(_row_products(t_indptr, t_indices, t_data, basis))
+        basis = _row_products(indptr, indices, data, basis)
+    basis, _ = np.linalg.qr(basis)
+    projected = _row_products(t_indptr, t_indices, t_data, basis).T
+    _, _, vt = np.linalg.svd(projected, full_matrices=False)
+    term_basis = np.ascontiguousarray(vt[:k].T, dtype=np.float32)
+
+    doc_vectors = _row_products(indptr, indices, data, term_basis)
+    doc_vectors /= np.maximum(np.linalg.norm(doc_vectors, axis=1, keepdims=True), 1e-12)
+    term_vectors = term_basis * idf[:, None]
+
+    docs_path, terms_path, vocab_path = paths_for(Path(data_path))
+    # Write to temp names and swap, so running workers never map a half-written file
+    for path, array in ((terms_path, term_vectors), (docs_path, doc_vectors)):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        tmp_path.replace(path)
+    tmp_path = vocab_path.with_name(vocab_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"dimensions": k, "verses": len(counted), "terms": vocabulary}, f)
+    tmp_path.replace(vocab_path)
+    return len(counted)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.agents.semantic")
+    parser.add_argument("data_path", nargs="?", default=str(Path("data") / "bible_verses.json"))
+    parser.add_argument("--processes", type=int, default=0)
+    args = parser.parse_args()
+    count = build(Path(args.data_path), args.processes)
+    print(f"Built semantic index for {count} verses from {args.data_path}")
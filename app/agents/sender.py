@@ -0,0 +1,165 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+TWILIO_API_URL = os.getenv("TWILIO_API_URL", "https://api.twilio.com")
+# Messages per second allowed on the sending number (Twilio's default WhatsApp cap is 80)
+TWILIO_SEND_RATE = float(os.getenv("TWILIO_SEND_RATE", "80"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class SendError(Exception):
+    """A message could not be delivered to Twilio after all retries"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+def _never_sent(exc: requests.RequestException) -> bool:
+    """True for failures while connecting, before any of the request was written"""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.ConnectionError) or not exc.args:
+        return False
+    # requests wraps urllib3's MaxRetryError, whose reason is the underlying error. A connection
+    # dropped after the request was sent ("Connection aborted.") arrives as a ProtocolError instead.
+    reason = getattr(exc.args[0], "reason", exc.args[0])
+    return isinstance(reason, NewConnectionError)
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity` (default 100 ms worth)"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate / 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class WhatsAppSender:
+    """Outbound WhatsApp messages through the Twilio Messages REST API.
+
+    One requests.Session with a keep-alive pool of `workers` connections is
+    shared by every sending thread. Each attempt waits for a token from a
+    bucket refilled at `rate` messages per second. A 429, a 5xx or a
+    failure to connect is retried up to `max_retries` times with full-jitter
+    exponential backoff, honouring Retry-After when Twilio sends it. A read
+    timeout or a connection dropped mid-request is not retried, since Twilio
+    may already have accepted the message.
+    """
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str,
+                 base_url: str = TWILIO_API_URL, rate: float = TWILIO_SEND_RATE,
+                 workers: int = 8, max_retries: int = 4, backoff: float = 0.5,
+                 max_backoff: float = 20.0, timeout: float = 10.0):
+        self.from_number = from_number
+        self.url = f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate)
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> Optional["WhatsAppSender"]:
+        """Sender configured from TWILIO_* variables, or None when credentials are not set"""
+        account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+        auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+        from_number = os.getenv("TWILIO_PHONE_NUMBER")
+        if not (account_sid and auth_token and from_number):
+            return None
+        return cls(account_sid, auth_token, from_number, **kwargs)
+
+    def send(self, to: str, body: str) -> str:
+        """Send one message and return its Twilio sid; raises SendError once retries are exhausted"""
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            status, retry_after, error = None, None, None
+            try:
+                response = self.session.post(
+                    self.url,
+                    data={"From": self.from_number, "To": to, "Body": body},
+                    timeout=self.timeout
+                )
+                status = response.status_code
+                if status < 300:
+                    self._count("sent")
+                    return response.json().get("sid", "")
+                error = f"Twilio returned {status}: {response.text[:200]}"
+                retry_after = response.headers.get("Retry-After")
+            except requests.RequestException as exc:
+                if not _never_sent(exc):
+                    # A read timeout, a dropped connection or a broken response: Twilio may already
+                    # have queued the message, and a retry would deliver it twice
+                    self._count("failed")
+                    raise SendError(f"Request to Twilio failed: {exc}") from exc
+                error = f"Could not connect to Twilio: {exc}"
+
+            if (status is not None and status not in RETRY_STATUSES) or attempt >= self.max_retries:
+                self._count("failed")
+                raise SendError(error, status)
+            attempt += 1
+            self._count("retried")
+            time.sleep(self._retry_delay(attempt, retry_after))
+
+    def send_many(self, messages: Iterable[Tuple[str, str]]) -> List[Optional[str]]:
+        """Send (to, body) pairs concurrently; returns sids in order, None where sending failed"""
+        def send_one(message):
+            try:
+                return self.send(*message)
+            except SendError as exc:
+                logger.warning("WhatsApp send to %s failed: %s", message[0], exc)
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whatsapp-send") as pool:
+            return list(pool.map(send_one, messages))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sent": self.sent, "failed": self.failed, "retried": self.retried}
+
+    def close(self):
+        self.session.close()
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
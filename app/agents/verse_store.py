@@ -0,0 +1,155 @@
+"""Compact binary verse store.
+
+The JSON corpus is compiled once into a flat file in native byte order:
+
+    header    magic, verse/book/chapter counts, section sizes
+    books     book names, UTF-8, newline separated (interned as uint16 ids)
+    book_ids  uint16[verses]
+    chapters  uint16[verses]
+    numbers   uint16[verses]      verse numbers
+    offsets   uint32[verses + 1]  into the text blob
+    starts    uint32[chapters + 1] first verse of each chapter
+    text      UTF-8 blob
+
+At runtime the file is memory-mapped, so opening it costs a header parse and
+every gunicorn worker shares the same page-cache pages.
+
+Build it with:
+
+    python -m app.agents.verse_store [data/bible_verses.json] [data/bible_verses.bin]
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+MAGIC = b"BVS1"
+HEADER = struct.Struct("<4sIIIII")  # magic, verses, books, chapters, books_len, text_len
+
+
+def _pad(size: int) -> int:
+    return (size + 3) & ~3
+
+
+class VerseStore:
+    """Read-only, index-addressable view over a compiled verse corpus"""
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, verse_count, book_count, chapter_count, books_len, text_len = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled verse store")
+
+        pos = HEADER.size
+        self.books: Tuple[str, ...] = tuple(bytes(view[pos:pos + books_len]).decode("utf-8").split("\n")) if book_count else ()
+        pos = _pad(pos + books_len)
+
+        def section(fmt: str, count: int, itemsize: int):
+            nonlocal pos
+            part = view[pos:pos + count * itemsize].cast(fmt)
+            pos = _pad(pos + count * itemsize)
+            return part
+
+        self.book_ids = section("H", verse_count, 2)
+        self.chapters = section("H", verse_count, 2)
+        self.verse_numbers = section("H", verse_count, 2)
+        self.offsets = section("I", verse_count + 1, 4)
+        starts = section("I", chapter_count + 1, 4)
+        self._text_start = pos
+        self._count = verse_count
+
+        self.chapter_slices: Dict[Tuple[str, int], Tuple[int, int]] = {}
+        for i in range(chapter_count):
+            first = starts[i]
+            key = (self.books[self.book_ids[first]], self.chapters[first])
+            self.chapter_slices[key] = (first, starts[i + 1])
+
+    @classmethod
+    def open(cls, path: Path) -> "VerseStore":
+        """Memory-map a compiled store from disk"""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_verses(cls, verses: Sequence[Dict[str, Any]]) -> "VerseStore":
+        """Compile verse dicts into an in-memory store (JSON fallback path)"""
+        return cls(compile_verses(verses))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._verse(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("verse index out of range")
+        return self._verse(index)
+
+    def text(self, index: int) -> str:
+        start = self._text_start + self.offsets[index]
+        end = self._text_start + self.offsets[index + 1]
+        return self._buffer[start:end].decode("utf-8")
+
+    def _verse(self, index: int) -> Dict[str, Any]:
+        return {
+            "book": self.books[self.book_ids[index]],
+            "chapter": self.chapters[index],
+            "verse": self.verse_numbers[index],
+            "text": self.text(index)
+        }
+
+
+def compile_verses(verses: Sequence[Dict[str, Any]]) -> bytes:
+    """Serialize verses into the store format, grouped contiguously by chapter"""
+    chapters: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+    for verse_data in verses:
+        chapters.setdefault((verse_data["book"], verse_data["chapter"]), []).append(verse_data)
+
+    books: Dict[str, int] = {}
+    book_ids, chapter_numbers, verse_numbers = array("H"), array("H"), array("H")
+    offsets, starts = array("I", [0]), array("I")
+    text = bytearray()
+    for (book, chapter), chapter_verses in chapters.items():
+        starts.append(len(verse_numbers))
+        book_id = books.setdefault(book, len(books))
+        for verse_data in sorted(chapter_verses, key=lambda v: v["verse"]):
+            book_ids.append(book_id)
+            chapter_numbers.append(chapter)
+            verse_numbers.append(verse_data["verse"])
+            text += verse_data["text"].encode("utf-8")
+            offsets.append(len(text))
+    starts.append(len(verse_numbers))
+
+    book_blob = "\n".join(books).encode("utf-8")
+    out = bytearray(HEADER.pack(MAGIC, len(verse_numbers), len(books), len(chapters), len(book_blob), len(text)))
+    for part in (book_blob, book_ids, chapter_numbers, verse_numbers, offsets, starts):
+        out += bytes(part)
+        out += b"\0" * (_pad(len(out)) - len(out))
+    out += text
+    return bytes(out)
+
+
+def build(json_path: Path, out_path: Path) -> int:
+    """Compile a bible_verses.json file to a binary store; returns the verse count"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        verses = json.load(f).get("verses", [])
+    data = compile_verses(verses)
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    # Atomic swap so running workers never map a half-written file
+    tmp_path.replace(out_path)
+    return len(verses)
+
+
+if __name__ == "__main__":
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("data") / "bible_verses.json"
+    target = Path(sys.argv[2]) if len(sys.argv) > 2 else source.with_suffix(".bin")
+    count = build(source, target)
+    print(f"Compiled {count} verses from {source} to {target}")
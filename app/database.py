@@ -1,19 +1,65 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from app.metrics import instrument_engine
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bible_agent.db")
 
+# Concurrent sessions (async requests, background flushers) wait for SQLite's write lock instead of failing
+SQLITE_CONNECT_ARGS = {"check_same_thread": False, "timeout": 30}
+
 engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    DATABASE_URL, connect_args=SQLITE_CONNECT_ARGS if "sqlite" in DATABASE_URL else {}
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+# The webhook's AsyncSession. Only a throughput win on Postgres, where query round-trips overlap.
+# On SQLite every write serializes on one lock and aiosqlite adds a thread hop per statement:
+# benchmarks/bench_async_db.py measures about 140 req/s against 245 for the sync session. It is
+# still used there because the sync session blocks the event loop (seconds of lag under load, so
+# /health and every other in-flight request stall), while the async one keeps lag near 1 ms.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, connect_args={"timeout": 30} if "sqlite" in ASYNC_DATABASE_URL else {}
+)
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """WAL lets readers proceed while a writer commits"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+if "sqlite" in DATABASE_URL:
+    event.listen(engine, "connect", _enable_sqlite_wal)
+if "sqlite" in ASYNC_DATABASE_URL:
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_wal)
+
+# Statement and commit counters for /metrics
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+# expire_on_commit=False: attributes can't be lazy-loaded implicitly under asyncio
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -22,3 +68,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
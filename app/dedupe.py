@@ -0,0 +1,51 @@
+"""Per-worker dedupe of Twilio webhook retries, keyed on MessageSid.
+
+Twilio retries a webhook whose reply was slow. Recently answered sids map
+to their TwiML reply bytes in a bounded LRU, so a retry is answered without
+touching the agents. A retry that arrives while the original is still being
+processed waits for that result instead of running the pipeline a second
+time. Retries that land on another worker are caught by the unique
+processed_messages.message_sid row written in the original's unit of work.
+"""
+import asyncio
+import os
+from typing import Dict, Optional
+from app.cache import LRUCache
+
+RECENT_MESSAGES = int(os.getenv("RECENT_MESSAGES", "10000"))
+
+class MessageDeduplicator:
+    def __init__(self, maxsize: int = RECENT_MESSAGES):
+        # sid -> TwiML reply bytes
+        self.replies = LRUCache(maxsize)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def claim(self, message_sid: str) -> Optional[bytes]:
+        """Reply bytes to resend for a retry, or None once this request owns the sid.
+
+        The owner must call finish() when it is done, whether or not it
+        produced a reply.
+        """
+        while True:
+            reply = self.replies.get(message_sid)
+            if reply is not None:
+                return reply
+            pending = self._in_flight.get(message_sid)
+            if pending is None:
+                self._in_flight[message_sid] = asyncio.get_running_loop().create_future()
+                return None
+            # shield: a cancelled retry must not cancel the future other requests wait on
+            reply = await asyncio.shield(pending)
+            if reply is not None:
+                return reply
+            # The original failed without a reply; loop to take the sid over
+
+    def finish(self, message_sid: str, reply: Optional[bytes]):
+        """Record the reply (None on failure) and wake retries waiting on it"""
+        if reply is not None:
+            self.replies.set(message_sid, reply)
+        pending = self._in_flight.pop(message_sid, None)
+        if pending is not None and not pending.done():
+            pending.set_result(reply)
+
+recent_messages = MessageDeduplicator()
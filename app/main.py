@@ -1,98 +1,140 @@
-# app/main.py - ENHANCED DEBUG VERSION
-from fastapi import FastAPI, Request
-from twilio.twiml.messaging_response import MessagingResponse
-import os
+"""Production ASGI application.
+
+    uvicorn app.main:app                                   (Procfile)
+    gunicorn app.main:app -k uvicorn.workers.UvicornWorker (render.yaml, see gunicorn.conf.py)
+
+create_app() mounts the agent routers (the unauthenticated /users listing
+only with USERS_API_ENABLED=true). Its lifespan hook loads the corpus,
+indexes and compiled matchers and opens the database pools before the
+server accepts the first request. /health answers 503 until that warm-up
+has finished.
+
+Anything a reply doesn't need is kept off that path, since a Render
+free-tier instance cold-starts on the first message after idling: the
+scheduler (APScheduler, the HTTP sender) and the semantic index (numpy)
+load in a background thread once the app is serving, and the /bible/search
+index is built by the first search. Check the budget with
+`python -m benchmarks.bench_startup`.
+"""
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+import asyncio
 import logging
+import os
+import time
+from typing import List
+from app import metrics
+from app.agents.conversation_log import conversation_log
+from app.agents.memory import user_cache
+from app.agents.registry import get_registry, warm_up, watch_corpus
+from app.database import SessionLocal, async_engine, engine
+from app.dedupe import recent_messages
+from app.routes import bible, users, whatsapp
 
-# Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
-
-@app.get("/")
-def home():
-    return {"message": "Bible Agent Running", "status": "ok"}
-
-@app.get("/health")
-def health():
-    return {"status": "healthy"}
-
-@app.post("/webhook")
-async def whatsapp_webhook(request: Request):
-    """Enhanced debug version"""
+def _ping_engine():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+async def _warm_up():
+    """Load everything the first webhook would otherwise pay for"""
+    started = time.perf_counter()
+    # Corpus, verse store, planner matcher, pre-rendered replies.
+    # Already loaded when gunicorn preloaded it in the master; then this only refreezes.
+    registry = await asyncio.to_thread(warm_up)
+    # One pooled connection per engine (connect + PRAGMA), opened per process, never before fork
+    await asyncio.to_thread(_ping_engine)
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    logger.info(
+        "Warm-up finished in %.2fs (%d verses)", time.perf_counter() - started, len(registry.bible_matcher.verses)
+    )
+
+def _start_background():
+    """Optional subsystems, loaded after the app is already answering"""
+    get_registry().bible_matcher.semantic_index
+    if os.getenv("SCHEDULER_ENABLED", "true").lower() == "false":
+        return None
+    from app.agents.scheduler import SchedulerAgent
+    
+    # Every worker joins the scheduler lease; only the current holder runs jobs
+    scheduler_agent = SchedulerAgent(SessionLocal())
+    scheduler_agent.start()
+    return scheduler_agent
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await _warm_up()
+    background = asyncio.create_task(asyncio.to_thread(_start_background))
+    # Picks up a rebuilt corpus (python -m app.agents.verse_store) without a restart
+    corpus_watch = asyncio.create_task(watch_corpus())
+    app.state.ready = True
     try:
-        logger.info("=" * 50)
-        logger.info("📱 WEBHOOK CALLED - Processing WhatsApp message")
-        
-        # Get form data
-        form_data = await request.form()
-        
-        # Log everything we receive
-        logger.info(f"📦 Form data received: {dict(form_data)}")
-        
-        message = form_data.get("Body", "").strip()
-        from_number = form_data.get("From", "")
-        
-        logger.info(f"💬 Message: '{message}'")
-        logger.info(f"📞 From: {from_number}")
-        
-        # Create response
-        response = MessagingResponse()
-        
-        if not message:
-            response.message("Welcome! Please send a message like HELLO to start.")
-        elif message.lower() in ["hello", "hi", "hey"]:
-            response.message("""🙏 Hello! Welcome to Bible Agent!
-
-📖 I'm here to help you study the Bible daily.
-
-Try these commands:
-• DAILY - Get today's reading
-• VERSE - Find Bible verses
-• HELP - See all commands
-
-What would you like to do?""")
-        elif "daily" in message.lower():
-            response.message("""📖 *DAILY BIBLE STUDY*
-
-Today's Reading: Matthew 1-2
-
-💭 Reflection Question:
-What does Jesus' genealogy teach us about God's faithfulness?
-
-⏰ Take 10 minutes to read and reflect.
-
-Reply READ when finished.""")
-        elif "help" in message.lower():
-            response.message("""📚 *BIBLE AGENT HELP*
-
-Available Commands:
-• HELLO - Start conversation
-• DAILY - Today's Bible reading
-• VERSE - Find verses by topic
-• PROGRESS - Check your stats
-• PRAYER - Share prayer request
-
-Start with DAILY for today's reading!""")
-        else:
-            response.message(f"""I received: "{message}"
-
-Type HELP to see all available commands, or try:
-• HELLO - To start
-• DAILY - For today's reading""")
-        
-        logger.info(f"📤 Sending response: {response}")
-        logger.info("=" * 50)
-        
-        return str(response)
-        
-    except Exception as e:
-        logger.error(f"❌ ERROR: {str(e)}", exc_info=True)
-        response = MessagingResponse()
-        response.message("Sorry, I encountered an error. Please try again in a moment.")
-        return str(response)
+        yield
+    finally:
+        app.state.ready = False
+        corpus_watch.cancel()
+        try:
+            scheduler_agent = await background
+            if scheduler_agent is not None:
+                scheduler_agent.shutdown()
+                scheduler_agent.db.close()
+        except Exception:
+            logger.exception("Background subsystems failed to start or stop")
+        finally:
+            # Write out conversation rows still queued behind the write-behind log, whatever failed above
+            conversation_log.stop()
+
+def _cache_gauges() -> List[str]:
+    """Cache and write-behind queue state at scrape time"""
+    caches = dict(get_registry().cache_stats(), users=user_cache.stats(), message_replies=recent_messages.replies.stats())
+    log_stats = conversation_log.stats()
+    return (
+        metrics.gauge_lines("bible_agent_cache_entries", "Entries held per in-process cache",
+                            {(("cache", name),): stats["size"] for name, stats in caches.items()})
+        + metrics.gauge_lines("bible_agent_cache_hit_rate", "Lifetime hit rate per in-process cache",
+                              {(("cache", name),): stats["hit_rate"] for name, stats in caches.items()})
+        + metrics.gauge_lines("bible_agent_conversation_log", "Write-behind conversation log counters",
+                              {(("state", state),): value for state, value in log_stats.items()})
+    )
+
+metrics.register_collector(_cache_gauges)
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Bible Agent", lifespan=lifespan)
+    app.state.ready = False
+
+    # Twilio is configured to post to /webhook at the root
+    app.include_router(whatsapp.router, tags=["whatsapp"])
+    # Lists every user and phone number without authentication: local debugging only
+    if os.getenv("USERS_API_ENABLED", "false").lower() == "true":
+        app.include_router(users.router, prefix="/users", tags=["users"])
+    app.include_router(bible.router, prefix="/bible", tags=["bible"])
+
+    @app.get("/")
+    def home():
+        return {"message": "Bible Agent Running", "status": "ok"}
+
+    @app.get("/health")
+    def health():
+        """Ready only after warm-up, so deploys don't route the first user to a cold process"""
+        if not app.state.ready:
+            return JSONResponse({"status": "starting"}, status_code=503)
+        return {"status": "healthy"}
+
+    @app.get("/metrics")
+    def prometheus_metrics():
+        """Prometheus text exposition; each gunicorn worker reports its own process"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")), log_level="info")
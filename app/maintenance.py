@@ -0,0 +1,148 @@
+"""Offline maintenance jobs.
+
+    python -m app.maintenance backfill-intents [--batch-size N] [--processes N]
+    python -m app.maintenance reconcile-stats [--batch-size N]
+"""
+import argparse
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app import models
+from app.agents.planner import PlannerAgent
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+def _iter_conversations(db: Session, message_type: str, page_size: int) -> Iterator[Tuple[int, str, str]]:
+    """Stream (id, content, intent) rows by keyset pagination on the primary key"""
+    last_id = 0
+    while True:
+        rows = db.query(
+            models.Conversation.id, models.Conversation.content, models.Conversation.intent
+        ).filter(
+            models.Conversation.message_type == message_type,
+            models.Conversation.id > last_id
+        ).order_by(models.Conversation.id).limit(page_size).all()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1].id
+
+def backfill_intents(db: Session, batch_size: int = 1000, processes: int = 0,
+                     message_type: str = "user_message") -> Dict[str, Any]:
+    """Re-classify stored messages and write changed intents back in batches.
+
+    Rows are streamed by keyset, classified with PlannerAgent.analyze_intents
+    and written with one executemany UPDATE and one commit per batch.
+    """
+    planner = PlannerAgent()
+    # Rows handed to the classifier but not yet matched with their result
+    pending = deque()
+
+    def contents():
+        for row in _iter_conversations(db, message_type, batch_size):
+            pending.append(row)
+            yield row.content or ""
+
+    started = time.perf_counter()
+    scanned = updated = 0
+    changes = []
+    results = planner.analyze_intents(contents(), chunk_size=batch_size, processes=processes)
+    for result in results:
+        row = pending.popleft()
+        scanned += 1
+        intent = result["intent"]
+        if intent != row.intent:
+            changes.append({"id": row.id, "intent": intent})
+        if len(changes) >= batch_size:
+            updated += _flush(db, changes)
+        if scanned % (batch_size * 10) == 0:
+            _log_progress(scanned, updated, started)
+    updated += _flush(db, changes)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "scanned": scanned,
+        "updated": updated,
+        "seconds": round(elapsed, 2),
+        "messages_per_second": round(scanned / elapsed, 1) if elapsed else 0.0
+    }
+    logger.info("Intent backfill finished: %s", stats)
+    return stats
+
+def reconcile_user_stats(db: Session, batch_size: int = 1000) -> Dict[str, Any]:
+    """Rebuild the denormalized User counters from UserProgress and Bookmark history.
+
+    Works through users in primary-key ranges with one correlated UPDATE and
+    one commit per range, so a large table never holds a long write lock.
+    """
+    chapters = select(
+        func.coalesce(func.sum(models.UserProgress.chapter_end - models.UserProgress.chapter_start + 1), 0)
+    ).where(models.UserProgress.user_id == models.User.id).scalar_subquery()
+    bookmarks = select(func.count(models.Bookmark.id)).where(
+        models.Bookmark.user_id == models.User.id
+    ).scalar_subquery()
+
+    started = time.perf_counter()
+    max_id = db.query(func.max(models.User.id)).scalar() or 0
+    updated = 0
+    for low in range(0, max_id, batch_size):
+        result = db.execute(
+            update(models.User)
+            .where(models.User.id > low, models.User.id <= low + batch_size)
+            .values(chapters_read=chapters, total_bookmarks=bookmarks)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        updated += result.rowcount
+
+    stats = {"users": updated, "seconds": round(time.perf_counter() - started, 2)}
+    logger.info("User stats reconciled: %s", stats)
+    return stats
+
+def _flush(db: Session, changes: list) -> int:
+    """Bulk UPDATE by primary key in one transaction"""
+    if not changes:
+        return 0
+    count = len(changes)
+    db.execute(update(models.Conversation), changes)
+    db.commit()
+    changes.clear()
+    return count
+
+def _log_progress(scanned: int, updated: int, started: float):
+    elapsed = time.perf_counter() - started
+    rate = scanned / elapsed if elapsed else 0.0
+    logger.info("Backfilled %d messages (%d updated), %.0f msg/s", scanned, updated, rate)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill-intents", help="Re-run intent analysis over stored messages")
+    backfill.add_argument("--batch-size", type=int, default=1000)
+    backfill.add_argument("--processes", type=int, default=0)
+    backfill.add_argument("--message-type", default="user_message")
+
+    reconcile = commands.add_parser("reconcile-stats", help="Rebuild per-user chapter and bookmark counters")
+    reconcile.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if args.command == "backfill-intents":
+            stats = backfill_intents(db, args.batch_size, args.processes, args.message_type)
+            print(f"Scanned {stats['scanned']} messages, updated {stats['updated']} "
+                  f"in {stats['seconds']}s ({stats['messages_per_second']} msg/s)")
+        elif args.command == "reconcile-stats":
+            stats = reconcile_user_stats(db, args.batch_size)
+            print(f"Reconciled counters for {stats['users']} users in {stats['seconds']}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""In-process metrics with Prometheus text exposition.
+
+Hot-path timings are recorded as histograms: span("intent_analysis") around
+a block, or @timed("memory.add_bookmark") on a function. request_scope()
+opens a per-request scope; SQL statements and commits issued inside it
+(counted by engine events, which also fire inside AsyncSession.run_sync)
+are observed when the scope closes. render() produces the text served at
+/metrics.
+
+Recording is a perf_counter pair, a bisect and a few increments under a
+lock, so it stays on in production; set METRICS_ENABLED=false to turn every
+span into a no-op. Metrics are per process: under gunicorn each worker
+reports its own.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() != "false"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            base = ",".join(f'{name}="{value}"' for name, value in zip(self.labelnames, labels))
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+span_seconds = Histogram(
+    "bible_agent_span_seconds", "Time spent in instrumented hot-path sections", LATENCY_BUCKETS, ("span",)
+)
+request_seconds = Histogram(
+    "bible_agent_request_seconds", "Webhook request latency by intent", LATENCY_BUCKETS, ("intent",)
+)
+request_statements = Histogram(
+    "bible_agent_request_sql_statements", "SQL statements executed per webhook request", COUNT_BUCKETS
+)
+request_commits = Histogram(
+    "bible_agent_request_commits", "Database commits per webhook request", COUNT_BUCKETS
+)
+sql_statements_total = Counter("bible_agent_sql_statements_total", "SQL statements executed by this process")
+commits_total = Counter("bible_agent_commits_total", "Database commits issued by this process")
+
+METRICS = [span_seconds, request_seconds, request_statements, request_commits, sql_statements_total, commits_total]
+# Callables returning extra exposition lines (cache and queue gauges), evaluated at scrape time
+_collectors: List[Callable[[], List[str]]] = []
+
+class _RequestCounts:
+    __slots__ = ("statements", "commits")
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+_request_counts: ContextVar[Optional[_RequestCounts]] = ContextVar("request_counts", default=None)
+
+class span:
+    """Time a block into bible_agent_span_seconds{span=name}"""
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if METRICS_ENABLED:
+            span_seconds.observe(time.perf_counter() - self.started, self.name)
+        return False
+
+def timed(name: str):
+    """Decorator form of span()"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper if METRICS_ENABLED else function
+    return decorate
+
+@contextmanager
+def request_scope():
+    """Count SQL statements and commits for one request; yields a dict to set the "intent" label on"""
+    counts = _RequestCounts()
+    token = _request_counts.set(counts)
+    labels = {"intent": "unknown"}
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        _request_counts.reset(token)
+        if METRICS_ENABLED:
+            request_seconds.observe(time.perf_counter() - started, labels["intent"] or "unknown")
+            request_statements.observe(counts.statements)
+            request_commits.observe(counts.commits)
+
+def _on_statement(conn, cursor, statement, parameters, context, executemany):
+    sql_statements_total.inc()
+    counts = _request_counts.get()
+    if counts is not None:
+        counts.statements += 1
+
+def _on_commit(conn):
+    commits_total.inc()
+    counts = _request_counts.get()
+    if counts is not None:
+        counts.commits += 1
+
+def instrument_engine(engine: Engine):
+    """Count statements and commits on a (sync) engine; idempotent"""
+    if METRICS_ENABLED and not event.contains(engine, "before_cursor_execute", _on_statement):
+        event.listen(engine, "before_cursor_execute", _on_statement)
+        event.listen(engine, "commit", _on_commit)
+
+def register_collector(collector: Callable[[], List[str]]):
+    _collectors.append(collector)
+
+def gauge_lines(name: str, help_text: str, values: Dict[Tuple[Tuple[str, str], ...], float]) -> List[str]:
+    """Exposition lines for a gauge with one sample per label set"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in values.items():
+        label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
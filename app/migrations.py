@@ -0,0 +1,176 @@
+"""Versioned schema migrations for SQLite and Postgres.
+
+    python -m app.migrations upgrade   # apply pending migrations
+    python -m app.migrations current   # print the schema version
+    python -m app.migrations check     # EXPLAIN the hot per-user queries, fail on table scans
+
+Each migration is idempotent (it inspects before altering), so it is safe on
+both a fresh database, where the baseline creates the current schema, and an
+existing one created by earlier releases. The applied version is recorded in
+the schema_version table.
+"""
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from app import models
+from app.database import Base, engine as default_engine
+
+def _baseline(conn: Connection):
+    """Create any missing tables from the models"""
+    Base.metadata.create_all(conn)
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str):
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def _user_stat_counters(conn: Connection):
+    """Denormalized chapters_read / total_bookmarks on users, backfilled from history"""
+    _add_column(conn, "users", "chapters_read", "INTEGER DEFAULT 0")
+    _add_column(conn, "users", "total_bookmarks", "INTEGER DEFAULT 0")
+    conn.execute(text("""
+        UPDATE users SET
+            chapters_read = (SELECT COALESCE(SUM(chapter_end - chapter_start + 1), 0)
+                             FROM user_progress WHERE user_progress.user_id = users.id),
+            total_bookmarks = (SELECT COUNT(*) FROM bookmarks WHERE bookmarks.user_id = users.id)
+    """))
+
+def _composite_user_indexes(conn: Connection):
+    """(user_id, date/created_at) indexes for the streak check and per-user history"""
+    for index_name, table, columns in (
+        ("ix_user_progress_user_id_date", "user_progress", "user_id, date"),
+        ("ix_bookmarks_user_id_created_at", "bookmarks", "user_id, created_at"),
+        ("ix_conversations_user_id_created_at", "conversations", "user_id, created_at"),
+    ):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})"))
+
+def _reminder_buckets(conn: Connection):
+    """Per-user timezone, UTC reminder minute bucket and last-sent marker"""
+    _add_column(conn, "users", "timezone", "VARCHAR DEFAULT 'UTC'")
+    _add_column(conn, "users", "reminder_minute", "INTEGER DEFAULT 480")
+    _add_column(conn, "users", "last_reminder_at", "TIMESTAMP")
+    # Existing users have no timezone yet, so their preferred_time is already UTC. Parsed by
+    # models.reminder_minute, as on every later write, so "9:30" and "09:30" land in the same bucket.
+    for (preferred_time,) in conn.execute(text("SELECT DISTINCT preferred_time FROM users")).fetchall():
+        condition = "preferred_time IS NULL" if preferred_time is None else "preferred_time = :preferred_time"
+        conn.execute(
+            text(f"UPDATE users SET reminder_minute = :minute WHERE {condition}"),
+            {"minute": models.reminder_minute(preferred_time, "UTC"), "preferred_time": preferred_time}
+        )
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_reminder_minute_id ON users (reminder_minute, id)"))
+
+def _scheduler_coordination(conn: Connection):
+    """Leader lease and per-occurrence claim tables for multi-worker scheduling"""
+    Base.metadata.create_all(conn, tables=[models.SchedulerLease.__table__, models.JobRun.__table__])
+
+def _processed_messages(conn: Connection):
+    """Unique MessageSid table for idempotent webhook retries"""
+    Base.metadata.create_all(conn, tables=[models.ProcessedMessage.__table__])
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline schema", _baseline),
+    (2, "user stat counters", _user_stat_counters),
+    (3, "composite per-user indexes", _composite_user_indexes),
+    (4, "reminder minute buckets", _reminder_buckets),
+    (5, "scheduler lease and job runs", _scheduler_coordination),
+    (6, "processed message sids", _processed_messages),
+]
+
+def _ensure_version_table(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR, applied_at VARCHAR)"
+    ))
+
+def current_version(engine: Engine = default_engine) -> int:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+def upgrade(engine: Engine = default_engine) -> List[int]:
+    """Apply pending migrations in order, each in its own transaction"""
+    applied = []
+    version = current_version(engine)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": number, "d": description, "t": datetime.utcnow().isoformat()}
+            )
+        applied.append(number)
+    return applied
+
+def _hot_queries():
+    """The per-user queries on the webhook path, as MemoryAgent issues them"""
+    today = datetime.utcnow().date()
+    yesterday = today - timedelta(days=1)
+    return [
+        ("user by phone", select(models.User).where(models.User.phone_number == "whatsapp:+10000000000").limit(1)),
+        ("reply by message sid", select(models.ProcessedMessage.reply).where(
+            models.ProcessedMessage.message_sid == "SM00000000000000000000000000000000"
+        )),
+        ("due reminders", select(models.User.id).where(
+            models.User.reminder_minute == 480,
+            models.User.id > 0
+        ).order_by(models.User.id).limit(500)),
+        ("streak check", select(models.UserProgress).where(
+            models.UserProgress.user_id == 1,
+            models.UserProgress.date >= yesterday,
+            models.UserProgress.date < today
+        ).limit(1)),
+        ("bookmarks by user", select(models.Bookmark).where(
+            models.Bookmark.user_id == 1
+        ).order_by(models.Bookmark.created_at.desc())),
+        ("conversations by user", select(models.Conversation).where(
+            models.Conversation.user_id == 1
+        ).order_by(models.Conversation.created_at.desc()).limit(20)),
+    ]
+
+def explain_hot_queries(engine: Engine = default_engine) -> List[Tuple[str, str, bool]]:
+    """EXPLAIN each hot query; ok means it uses an index with no full scan or sort step"""
+    results = []
+    sqlite = engine.dialect.name == "sqlite"
+    with engine.connect() as conn:
+        if not sqlite:
+            # Tiny tables make Postgres prefer a seq scan; ask whether an index plan exists at all
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        for name, query in _hot_queries():
+            compiled = query.compile(dialect=engine.dialect)
+            params = tuple(compiled.params[key] for key in compiled.positiontup) if compiled.positional else compiled.params
+            prefix = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+            rows = conn.exec_driver_sql(prefix + str(compiled), params).fetchall()
+            plan = "\n".join(str(row[-1]) for row in rows)
+            if sqlite:
+                ok = "USING" in plan and "INDEX" in plan and "TEMP B-TREE" not in plan and not any(
+                    line.strip().startswith("SCAN") and "INDEX" not in line for line in plan.splitlines()
+                )
+            else:
+                ok = "Index" in plan and "Seq Scan" not in plan and "Sort" not in plan
+            results.append((name, plan, ok))
+    return results
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "upgrade"
+    if command == "upgrade":
+        applied = upgrade()
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+        print(f"Schema version: {current_version()}")
+    elif command == "current":
+        print(current_version())
+    elif command == "check":
+        failed = False
+        for name, plan, ok in explain_hot_queries():
+            print(f"[{'ok' if ok else 'SCAN'}] {name}\n    " + plan.replace("\n", "\n    "))
+            failed = failed or not ok
+        sys.exit(1 if failed else 0)
+    else:
+        sys.exit(f"Unknown command: {command}")
+
+if __name__ == "__main__":
+    main()
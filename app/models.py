@@ -1,7 +1,27 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON
+from datetime import date, datetime, time, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, Index, UniqueConstraint, event, inspect
 from sqlalchemy.sql import func
 from app.database import Base
 
+DEFAULT_PREFERRED_TIME = "08:00"
+
+def reminder_minute(preferred_time: Optional[str], tz_name: Optional[str], on: Optional[date] = None) -> int:
+    """UTC minute of the day (0-1439) at which a local HH:MM falls on the given date"""
+    try:
+        hour, minute = (int(part) for part in (preferred_time or DEFAULT_PREFERRED_TIME).split(":")[:2])
+        local_time = time(hour, minute)
+    except ValueError:
+        local_time = time(8, 0)
+    try:
+        zone = ZoneInfo(tz_name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = timezone.utc
+    on = on or datetime.utcnow().date()
+    utc = datetime.combine(on, local_time, tzinfo=zone).astimezone(timezone.utc)
+    return utc.hour * 60 + utc.minute
+
 class User(Base):
     __tablename__ = "users"
     
@@ -17,12 +37,35 @@ class User(Base):
     last_chapter = Column(Integer, default=0)
     total_days_engaged = Column(Integer, default=0)
     current_streak = Column(Integer, default=0)
-    preferred_time = Column(String, default="08:00")
+    preferred_time = Column(String, default=DEFAULT_PREFERRED_TIME)
+    timezone = Column(String, default="UTC")
+    # preferred_time in UTC minutes, kept in sync by the mapper events below
+    reminder_minute = Column(Integer, default=8 * 60)
+    last_reminder_at = Column(DateTime, nullable=True)
+    
+    # Denormalized counters, maintained by MemoryAgent and rebuilt by `python -m app.maintenance reconcile-stats`
+    chapters_read = Column(Integer, default=0)
+    total_bookmarks = Column(Integer, default=0)
     
     
     receive_daily_reminders = Column(Boolean, default=True)
     receive_checkins = Column(Boolean, default=True)
     study_style = Column(String, default="devotional")  
+    
+    __table_args__ = (
+        # Due-reminder lookup: reminder_minute = ? AND id > ? ORDER BY id
+        Index("ix_users_reminder_minute_id", "reminder_minute", "id"),
+    )
+
+@event.listens_for(User, "before_insert")
+def _set_reminder_minute(mapper, connection, user):
+    user.reminder_minute = reminder_minute(user.preferred_time, user.timezone)
+
+@event.listens_for(User, "before_update")
+def _sync_reminder_minute(mapper, connection, user):
+    state = inspect(user)
+    if state.attrs.preferred_time.history.has_changes() or state.attrs.timezone.history.has_changes():
+        user.reminder_minute = reminder_minute(user.preferred_time, user.timezone)
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
@@ -35,6 +78,11 @@ class UserProgress(Base):
     chapter_end = Column(Integer)
     completed = Column(Boolean, default=False)
     reading_time_minutes = Column(Integer, nullable=True)
+    
+    __table_args__ = (
+        # Streak check: user_id = ? AND date in [yesterday, today)
+        Index("ix_user_progress_user_id_date", "user_id", "date"),
+    )
 
 class Bookmark(Base):
     __tablename__ = "bookmarks"
@@ -47,6 +95,11 @@ class Bookmark(Base):
     note = Column(Text, nullable=True)
     tags = Column(JSON, default=[]) 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # get_user_bookmarks: user_id = ? ORDER BY created_at DESC, no sort step
+        Index("ix_bookmarks_user_id_created_at", "user_id", "created_at"),
+    )
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -58,6 +111,10 @@ class Conversation(Base):
     intent = Column(String, nullable=True) 
     message_metadata = Column(JSON, nullable=True) 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_conversations_user_id_created_at", "user_id", "created_at"),
+    )
 class Feedback(Base):
     __tablename__ = "feedback"
     
@@ -67,3 +124,34 @@ class Feedback(Base):
     rating = Column(Integer)  
     feedback_text = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SchedulerLease(Base):
+    """Leader lease: the worker whose lease has not expired runs the scheduled jobs"""
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String, primary_key=True)
+    owner = Column(String)
+    expires_at = Column(DateTime)
+
+class JobRun(Base):
+    """One row per claimed job occurrence; the unique key stops a second worker running it"""
+    __tablename__ = "job_runs"
+    
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String)
+    scheduled_for = Column(DateTime)
+    owner = Column(String)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("job_id", "scheduled_for", name="uq_job_runs_job_id_scheduled_for"),
+    )
+
+class ProcessedMessage(Base):
+    """Reply sent for each inbound Twilio MessageSid; the unique key turns webhook retries into no-ops"""
+    __tablename__ = "processed_messages"
+    
+    id = Column(Integer, primary_key=True)
+    message_sid = Column(String, unique=True, nullable=False)
+    reply = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
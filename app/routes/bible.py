@@ -1,19 +1,69 @@
-from fastapi import APIRouter
+import hashlib
+import json
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from app.agents.registry import AgentRegistry, get_registry
 
 router = APIRouter()
 
-@router.get("/verses/{book}/{chapter}")
-def get_verses(book: str, chapter: int):
-    # This is a placeholder - you'll add actual Bible data later
-    return {
+CHAPTER_CACHE_CONTROL = "public, max-age=86400"
+
+
+def _chapter_payload(registry: AgentRegistry, translation: str, book: str, chapter: int) -> Optional[Tuple[bytes, str]]:
+    """Render a chapter to JSON bytes once and reuse it until the registry reloads"""
+    key = (translation, book, chapter)
+    cached = registry.chapter_payloads.get(key)
+    if cached is not None:
+        return cached
+    
+    verses = registry.bible_matcher.get_chapter(book, chapter)
+    if not verses:
+        return None
+    
+    body = json.dumps({
+        "translation": translation,
         "book": book,
         "chapter": chapter,
-        "verses": []
-    }
+        "verses": [{"verse": v["verse"], "text": v["text"]} for v in verses]
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    registry.chapter_payloads.set(key, (body, etag))
+    return body, etag
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match: a W/ prefix on a listed tag is ignored"""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+@router.get("/verses/{book}/{chapter}")
+def get_verses(request: Request, book: str, chapter: int, translation: Optional[str] = None):
+    registry = get_registry()
+    translation = translation or registry.bible_matcher.translation
+    if translation != registry.bible_matcher.translation:
+        raise HTTPException(status_code=404, detail="Translation not found")
+    
+    payload = _chapter_payload(registry, translation, book.title(), chapter)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    
+    body, etag = payload
+    headers = {"ETag": etag, "Cache-Control": CHAPTER_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/search")
-def search_verses(q: str = ""):
-    return {
-        "query": q,
-        "results": []
-    }
+def search_verses(
+    q: str = "",
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=50)
+):
+    """Full-text verse search: words, "exact phrases" and prefix* terms, BM25-ranked"""
+    return get_registry().search_index.search(q, page=page, page_size=page_size)
@@ -1,39 +1,105 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
-from twilio.twiml.messaging_response import MessagingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
-from app.database import get_db
-from app.agents.planner import PlannerAgent
-from app.agents.bible_matcher import BibleMatchingAgent
-from app.agents.memory import MemoryAgent
-from app.agents.response_composer import ResponseComposerAgent
-from app.agents.scheduler import SchedulerAgent
+from typing import Any, Dict
+from app import metrics, twiml
+from app.database import get_async_db
+from app.dedupe import recent_messages
+from app.agents.conversation_log import conversation_log
+from app.agents.memory import AsyncMemoryAgent, user_cache
+from app.agents.registry import get_registry
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+WRITE_INTENTS = {"daily_checkin", "bookmark"}
+
+CHECKIN_REPLY = "✅ Great job completing today's reading!\n\nGod's word is a lamp to your feet. See you tomorrow! 🙏"
+BOOKMARK_USAGE_REPLY = "Please specify a verse to bookmark. Example: SAVE John 3:16"
+twiml.prerender([CHECKIN_REPLY, BOOKMARK_USAGE_REPLY])
+
 @router.post("/webhook")
-async def whatsapp_webhook(request: Request, db: Session = Depends(get_db)):
+async def whatsapp_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Handle incoming WhatsApp messages"""
     
+    # Latency, SQL statements and commits per request, labelled by intent, for /metrics
+    with metrics.request_scope() as labels:
+        with metrics.span("webhook.parse_form"):
+            form_data = await request.form()
+        from_number = form_data.get("From", "")
+        message_body = form_data.get("Body", "").strip()
+        # Twilio sends a MessageSid with every message and repeats it when it retries
+        message_sid = form_data.get("MessageSid", "")
+        
+        logger.debug(f"Message from {from_number}: {message_body}")
+        
+        if not message_sid:
+            return twiml.bytes_response(await _reply(db, from_number, message_body, "", labels))
+        
+        # A retry of a message this worker answered (or is still answering) gets the same bytes
+        cached = await recent_messages.claim(message_sid)
+        if cached is not None:
+            labels["intent"] = "duplicate"
+            return twiml.bytes_response(cached)
+        body = None
+        try:
+            body = await _reply(db, from_number, message_body, message_sid, labels)
+            return twiml.bytes_response(body)
+        finally:
+            recent_messages.finish(message_sid, body)
+
+async def _reply(db: AsyncSession, from_number: str, message_body: str, message_sid: str,
+                 labels: dict) -> bytes:
+    """TwiML reply for a message; a write intent runs only if no worker has committed its sid yet"""
+    with metrics.span("planner.analyze_intent"):
+        intent_data = get_registry().planner.analyze_intent(message_body)
+    labels["intent"] = intent_data.get("intent")
+    # Only messages that change state are recorded by sid, in the commit they make anyway. Read-only
+    # replies stay free of database writes: recent_messages dedupes their retries on this worker,
+    # and a rerun on another worker only repeats the audit rows.
+    record_sid = bool(message_sid) and intent_data.get("intent") in WRITE_INTENTS
+    
+    # Conversation audit rows go through the write-behind log, off the reply path
+    memory = AsyncMemoryAgent(db, log_writer=conversation_log, user_cache=user_cache)
+    
+    try:
+        # One transaction (and one SQLite fsync) per inbound message
+        async with memory.unit_of_work():
+            stored = await memory.get_processed_reply(message_sid) if record_sid else None
+            if stored is not None:
+                # Answered before, by another worker or before a restart
+                labels["intent"] = "duplicate"
+                response_text = stored
+            else:
+                response_text = await _handle_message(memory, from_number, message_body, intent_data)
+                if record_sid:
+                    await memory.save_processed_message(message_sid, response_text)
+    except IntegrityError:
+        # Another worker committed the same sid first; every write made here was rolled back
+        stored = await memory.get_processed_reply(message_sid) if record_sid else None
+        if stored is None:
+            raise
+        labels["intent"] = "duplicate"
+        response_text = stored
+    
+    with metrics.span("webhook.twiml"):
+        return twiml.message(response_text)
+
+async def _handle_message(memory: AsyncMemoryAgent, from_number: str, message_body: str,
+                          intent_data: Dict[str, Any]) -> str:
+    """Run the agent pipeline for one analyzed message and return the reply text"""
+    registry = get_registry()
+    planner = registry.planner
+    bible_matcher = registry.bible_matcher
+    composer = registry.composer
     
-    form_data = await request.form()
-    from_number = form_data.get("From", "")
-    message_body = form_data.get("Body", "").strip()
-    
-    logger.info(f"Message from {from_number}: {message_body}")
-    
-    
-    planner = PlannerAgent()
-    bible_matcher = BibleMatchingAgent()
-    memory = MemoryAgent(db)
-    composer = ResponseComposerAgent()
-    
-    
-    user = memory.get_or_create_user(from_number)
+    # Writes start from the database row; read-only replies may use the cached user
+    writes_user = intent_data.get("intent") in WRITE_INTENTS
+    user = await memory.get_or_create_user(from_number, fresh=writes_user)
     
     
-    memory.save_conversation(
+    await memory.save_conversation(
         user.id, 
         "user_message", 
         message_body,
@@ -41,7 +107,6 @@ async def whatsapp_webhook(request: Request, db: Session = Depends(get_db)):
     )
     
     
-    intent_data = planner.analyze_intent(message_body)
     action = planner.decide_action(intent_data, {"user_id": user.id})
     
    
@@ -50,47 +115,51 @@ async def whatsapp_webhook(request: Request, db: Session = Depends(get_db)):
     if action == "bible_matcher":
         if intent_data.get("intent") == "daily_study":
             
-            reading_data = bible_matcher.get_daily_reading(
-                user.current_book, 
-                user.last_chapter
-            )
-            reading_data['reflection_question'] = bible_matcher.generate_reflection_question(
-                reading_data['book'], 
-                reading_data['chapter_start']
-            )
+            with metrics.span("bible_matcher.daily_reading"):
+                reading_data = bible_matcher.get_daily_reading(
+                    user.current_book, 
+                    user.last_chapter
+                )
+                reading_data['reflection_question'] = bible_matcher.generate_reflection_question(
+                    reading_data['book'], 
+                    reading_data['chapter_start']
+                )
             
             
-            stats = memory.get_user_stats(user.id)
-            response_text = composer.compose_daily_reading_response(reading_data, stats)
+            stats = await memory.get_user_stats(user.id)
+            with metrics.span("composer.daily_reading"):
+                response_text = composer.compose_daily_reading_response(reading_data, stats)
             
         elif intent_data.get("intent") == "verse_request":
             
             topic = intent_data.get("topic", "encouragement")
-            verses = bible_matcher.find_verses_by_topic(topic)
-            response_text = composer.compose_verse_response(verses, topic)
+            with metrics.span("registry.verse_response"):
+                response_text = registry.verse_response(topic, language=user.language or "en")
     
     elif action == "memory":
         if intent_data.get("intent") == "daily_checkin":
             
-            memory.update_user_progress(
+            await memory.update_user_progress(
                 user.id,
                 user.current_book,
                 user.last_chapter,
                 user.last_chapter + 2  
             )
-            response_text = "✅ Great job completing today's reading!\n\nGod's word is a lamp to your feet. See you tomorrow! 🙏"
+            response_text = CHECKIN_REPLY
         
         elif intent_data.get("intent") == "bookmark":
             verse_ref = intent_data.get("verse")
             if verse_ref:
-                memory.add_bookmark(user.id, verse_ref)
-                response_text = composer.compose_bookmark_saved(verse_ref)
+                await memory.add_bookmark(user.id, verse_ref)
+                with metrics.span("composer.bookmark_saved"):
+                    response_text = composer.compose_bookmark_saved(verse_ref)
             else:
-                response_text = "Please specify a verse to bookmark. Example: SAVE John 3:16"
+                response_text = BOOKMARK_USAGE_REPLY
         
         elif intent_data.get("intent") == "progress":
-            stats = memory.get_user_stats(user.id)
-            response_text = composer.compose_progress_response(stats)
+            stats = await memory.get_user_stats(user.id)
+            with metrics.span("composer.progress"):
+                response_text = composer.compose_progress_response(stats)
     
     elif action == "response_composer":
         if intent_data.get("intent") == "greeting":
@@ -98,24 +167,18 @@ async def whatsapp_webhook(request: Request, db: Session = Depends(get_db)):
         elif intent_data.get("intent") == "help":
             response_text = composer.compose_greeting()  
         else:
-            response_text = composer.compose_verse_response(
-                bible_matcher.find_verses_by_topic("encouragement"), 
-                "encouragement"
-            )
+            with metrics.span("registry.verse_response"):
+                response_text = registry.verse_response("encouragement", language=user.language or "en")
     
     
-    memory.save_conversation(
+    await memory.save_conversation(
         user.id,
         "agent_response",
         response_text,
         intent=intent_data.get("intent")
     )
     
-    
-    twilio_response = MessagingResponse()
-    twilio_response.message(response_text)
-    
-    return str(twilio_response)
+    return response_text
 
 @router.get("/webhook")
 async def verify_webhook(request: Request):
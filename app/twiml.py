@@ -0,0 +1,50 @@
+"""TwiML replies as bytes, without building MessagingResponse trees.
+
+A reply is always <Response><Message>text</Message></Response>, so the
+envelope is two precompiled byte fragments and only the message text is
+escaped per request. Texts registered with prerender() (greetings, help,
+fallbacks) are rendered once and served from a dict. The output is
+byte-for-byte what str(MessagingResponse) produces.
+"""
+from typing import Dict, Iterable
+from fastapi.responses import Response
+
+TWIML_MEDIA_TYPE = "application/xml"
+_PREFIX = b'<?xml version="1.0" encoding="UTF-8"?><Response><Message>'
+_SUFFIX = b"</Message></Response>"
+# ElementTree writes an element without text as a self-closing tag
+_EMPTY = b'<?xml version="1.0" encoding="UTF-8"?><Response><Message /></Response>'
+
+_prerendered: Dict[str, bytes] = {}
+
+def escape(text: str) -> str:
+    """Escape message text the way ElementTree does for element content"""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+def render(text: str) -> bytes:
+    if not text:
+        return _EMPTY
+    return _PREFIX + escape(text).encode("utf-8") + _SUFFIX
+
+def prerender(texts: Iterable[str]):
+    """Render constant replies once so message() serves them as stored bytes"""
+    for text in texts:
+        if text not in _prerendered:
+            _prerendered[text] = render(text)
+
+def message(text: str) -> bytes:
+    """TwiML bytes for one reply message"""
+    body = _prerendered.get(text)
+    if body is None:
+        body = render(text)
+    return body
+
+def bytes_response(body: bytes) -> Response:
+    """Response for already-rendered TwiML bytes"""
+    return Response(content=body, media_type=TWIML_MEDIA_TYPE)
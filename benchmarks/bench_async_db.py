@@ -0,0 +1,110 @@
+"""Concurrency benchmark: sync MemoryAgent on the event loop vs AsyncMemoryAgent.
+
+    python -m benchmarks.bench_async_db [requests] [concurrency] [database_url]
+
+Each simulated webhook does get_or_create_user, two save_conversation calls
+and get_user_stats. Alongside throughput it reports event-loop lag: a 1 ms
+heartbeat task measures how long the loop was blocked, which is what stalls
+every other in-flight request in a worker.
+
+Against a local SQLite file all writes serialize on one lock and the async
+driver pays a thread hop per statement, so raw req/s is lower; the
+win there is that the loop keeps serving. Against a networked database
+(pass a postgresql:// URL) query round-trips overlap and req/s scales with
+concurrency.
+"""
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.agents.memory import AsyncMemoryAgent, MemoryAgent
+from app.database import Base, SQLITE_CONNECT_ARGS, _async_url, _enable_sqlite_wal
+
+
+async def heartbeat(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((time.perf_counter() - started - 0.001) * 1000)
+
+
+def sync_request(Session, phone):
+    db = Session()
+    try:
+        memory = MemoryAgent(db)
+        user = memory.get_or_create_user(phone)
+        memory.save_conversation(user.id, "user_message", "hi")
+        memory.get_user_stats(user.id)
+        memory.save_conversation(user.id, "agent_response", "hello", intent="greeting")
+    finally:
+        db.close()
+
+
+async def async_request(Session, phone):
+    async with Session() as db:
+        memory = AsyncMemoryAgent(db)
+        user = await memory.get_or_create_user(phone)
+        await memory.save_conversation(user.id, "user_message", "hi")
+        await memory.get_user_stats(user.id)
+        await memory.save_conversation(user.id, "agent_response", "hello", intent="greeting")
+
+
+async def run(label, handler, total, concurrency):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await handler(f"whatsapp:+1555{i % 500:04d}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await beat
+
+    lags = lags or [0.0]
+    print(f"{label:<24} {total / elapsed:8.1f} req/s   loop lag p50 {statistics.median(lags):6.2f} ms"
+          f"   max {max(lags):7.2f} ms   heartbeats {len(lags)}")
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    if len(sys.argv) > 3:
+        url = sys.argv[3]
+    else:
+        url = f"sqlite:///{Path(tempfile.mkdtemp(prefix='bible-bench-')) / 'bench.db'}"
+    sqlite = url.startswith("sqlite")
+
+    engine = create_engine(url, connect_args=SQLITE_CONNECT_ARGS if sqlite else {})
+    async_engine = create_async_engine(_async_url(url), connect_args={"timeout": 30} if sqlite else {})
+    if sqlite:
+        event.listen(engine, "connect", _enable_sqlite_wal)
+        event.listen(async_engine.sync_engine, "connect", _enable_sqlite_wal)
+    Base.metadata.create_all(engine)
+    SyncSession = sessionmaker(bind=engine, autoflush=False)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def sync_handler(phone):
+        sync_request(SyncSession, phone)
+
+    async def async_handler(phone):
+        await async_request(AsyncSession, phone)
+
+    print(f"{total} requests, concurrency {concurrency}, {url}")
+    await run("sync on event loop", sync_handler, total, concurrency)
+    await run("async session", async_handler, total, concurrency)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
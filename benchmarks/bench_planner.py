@@ -0,0 +1,90 @@
+"""Benchmark PlannerAgent.analyze_intent against the previous keyword-loop planner.
+
+    python -m benchmarks.bench_planner
+"""
+import random
+import timeit
+
+from app.agents.planner import PlannerAgent
+
+MESSAGES = [
+    "hi", "Hello there", "good morning!", "DAILY", "what should I read today",
+    "done", "I finished it", "already read it", "verse about anxiety",
+    "I'm feeling anxious and worried about work", "i am so tired and stressed",
+    "save John 3:16", "bookmark Philippians 4:6-7 please", "how am i doing",
+    "PROGRESS", "help", "what can you do", "please pray for my mother",
+    "this is a long message about nothing in particular that goes on and on",
+    "thank you so much, I feel blessed and grateful today",
+    "this is great", "I already know that one", "nextdoor neighbours",
+]
+CALLS = 50_000
+
+
+class LegacyPlanner(PlannerAgent):
+    """The substring-loop implementation analyze_intent replaced"""
+
+    def analyze_intent(self, message):
+        message_lower = message.lower()
+        if self._is_daily_checkin(message_lower):
+            return {"intent": "daily_checkin", "action": "mark_complete"}
+        if self._is_bookmark_request(message_lower):
+            verse_ref = self._extract_verse_reference(message)
+            if verse_ref:
+                return {"intent": "bookmark", "verse": verse_ref, "action": "save"}
+        for intent, keywords in self.intent_keywords.items():
+            if any(keyword in message_lower for keyword in keywords):
+                if intent == "verse_request":
+                    return {
+                        "intent": "verse_request",
+                        "topic": self._legacy_topic(message_lower),
+                        "mood": self._detect_mood(message_lower)
+                    }
+                return {"intent": intent}
+        return {"intent": "conversation", "action": "respond_generally"}
+
+    def _is_daily_checkin(self, message):
+        return any(word in message for word in self.checkin_words) and len(message.split()) < 5
+
+    def _is_bookmark_request(self, message):
+        return any(word in message.lower() for word in self.bookmark_words)
+
+    def _legacy_topic(self, message):
+        filtered = [w for w in message.lower().split() if w not in self.stop_words]
+        for word in filtered:
+            if word in self.topic_map:
+                return self.topic_map[word]
+        return " ".join(filtered[:3]) if filtered else "encouragement"
+
+    def _detect_mood(self, message):
+        if any(word in message for word in self.positive_words):
+            return "positive"
+        elif any(word in message for word in self.negative_words):
+            return "negative"
+        return "neutral"
+
+
+def bench(planner, messages):
+    it = iter(messages)
+    seconds = timeit.timeit(lambda: planner.analyze_intent(next(it)), number=len(messages))
+    return seconds / len(messages) * 1e6
+
+
+def main():
+    rng = random.Random(1)
+    messages = [rng.choice(MESSAGES) for _ in range(CALLS)]
+    current, legacy = PlannerAgent(), LegacyPlanner()
+
+    legacy_us = bench(legacy, messages)
+    current_us = bench(current, messages)
+    print(f"legacy keyword loops:  {legacy_us:6.2f} us/message")
+    print(f"compiled matcher:      {current_us:6.2f} us/message  ({legacy_us / current_us:.2f}x)")
+
+    print("\nmessages classified differently (substring false positives fixed):")
+    for message in MESSAGES:
+        old, new = legacy.analyze_intent(message), current.analyze_intent(message)
+        if old != new:
+            print(f"  {message!r}: {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Search benchmark: p50/p99 query latency and index memory on a full-size corpus.
+
+    python -m benchmarks.bench_search [verse_count]
+
+Uses a synthetic 31,102-verse corpus (the size of a full Bible) unless a count
+is given.
+"""
+import random
+import statistics
+import sys
+import time
+
+from app.agents.search import SearchIndex
+from app.agents.verse_store import VerseStore
+from benchmarks.common import WORDS, synthetic_verses
+
+QUERIES = 2_000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_queries(rng: random.Random):
+    queries = []
+    for _ in range(QUERIES):
+        kind = rng.random()
+        if kind < 0.5:
+            queries.append(" ".join(rng.sample(WORDS, rng.randint(1, 3))))
+        elif kind < 0.8:
+            queries.append(f'"{rng.choice(WORDS)} {rng.choice(WORDS)}"')
+        else:
+            queries.append(rng.choice(WORDS)[:3] + "*")
+    return queries
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 31_102
+    store = VerseStore.from_verses(synthetic_verses(count))
+
+    started = time.perf_counter()
+    index = SearchIndex(store)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(42)
+    latencies = []
+    for query in make_queries(rng):
+        started = time.perf_counter()
+        index.search(query, page=rng.randint(1, 3), page_size=10)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    print(f"verses:        {count}")
+    print(f"terms:         {len(index.terms)}")
+    print(f"postings:      {len(index.post_docs)}")
+    print(f"build:         {build_seconds:.2f} s")
+    print(f"index memory:  {index.memory_bytes() / 1024 / 1024:.2f} MiB")
+    print(f"p50 latency:   {percentile(latencies, 50):.2f} ms")
+    print(f"p99 latency:   {percentile(latencies, 99):.2f} ms")
+    print(f"mean latency:  {statistics.mean(latencies):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
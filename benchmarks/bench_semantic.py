@@ -0,0 +1,53 @@
+"""Semantic topic index benchmark: build time and per-topic query latency.
+
+    python -m benchmarks.bench_semantic [verse_count] [processes]
+
+Builds the LSA files for a synthetic corpus (31,102 verses by default, the
+size of a full Bible), once single-process and once on a process pool, then
+times top-3 lookups for free-text topics against the memory-mapped matrices.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+from app.agents.semantic import SemanticIndex, TOPIC_QUERIES, build
+from benchmarks.common import WORDS, synthetic_verses, write_corpus
+
+QUERIES = 5_000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 31_102
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 2)
+    path = write_corpus(synthetic_verses(count))
+
+    for label, workers in (("1 process", 1), (f"{processes} processes", processes)):
+        started = time.perf_counter()
+        build(path, processes=workers)
+        print(f"build, {label:<14} {time.perf_counter() - started:7.2f} s")
+
+    index = SemanticIndex.open(path, count)
+    print(f"{index.doc_vectors.shape[0]} verses x {index.doc_vectors.shape[1]} dimensions, "
+          f"{len(index.term_ids)} terms")
+
+    rng = random.Random(11)
+    topics = list(TOPIC_QUERIES) + [" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(200)]
+    index.top_verses(topics[0])
+    samples = []
+    for _ in range(QUERIES):
+        topic = rng.choice(topics)
+        started = time.perf_counter()
+        index.top_verses(topic)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"top_verses  p50 {statistics.median(samples):.3f} ms   p99 {percentile(samples, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
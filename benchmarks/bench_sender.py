@@ -0,0 +1,107 @@
+"""Outbound sender benchmark against a local fake Twilio Messages API.
+
+    python -m benchmarks.bench_sender [messages] [rate] [latency_ms] [throttle_pct]
+
+The fake server answers POST .../Messages.json after `latency_ms` (default
+30), and answers a random `throttle_pct` percent of requests (default 5) with
+429 and Retry-After: 0. The benchmark compares three ways to send:
+
+- serial: a new connection for every message, the way a naive loop would
+- pooled: WhatsAppSender with its token bucket set to `rate` msgs/s (default 200)
+- unlimited: the pooled sender with an effectively unlimited rate, to show
+  the pool's own ceiling
+"""
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from app.agents.sender import WhatsAppSender
+
+
+class FakeTwilio(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.03
+    throttle = 0.05
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with FakeTwilio.lock:
+            FakeTwilio.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        if random.random() < self.throttle:
+            body, status = b'{"code": 20429, "message": "Too Many Requests"}', 429
+        else:
+            body, status = json.dumps({"sid": f"SM{random.getrandbits(64):016x}", "status": "queued"}).encode(), 201
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTwilio)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run(label, send, count):
+    FakeTwilio.connections = 0
+    messages = [(f"whatsapp:+1555{i:07d}", f"Reminder {i}: read Matthew 5") for i in range(count)]
+    started = time.perf_counter()
+    results = send(messages)
+    elapsed = time.perf_counter() - started
+    delivered = sum(1 for sid in results if sid)
+    print(f"{label:<28} {count / elapsed:8.1f} msg/s   delivered {delivered}/{count}"
+          f"   connections {FakeTwilio.connections}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 200.0
+    FakeTwilio.latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 30.0) / 1000
+    FakeTwilio.throttle = (float(sys.argv[4]) if len(sys.argv) > 4 else 5.0) / 100
+    server, url = serve()
+    print(f"{count} messages, latency {FakeTwilio.latency * 1000:.0f} ms, "
+          f"{FakeTwilio.throttle * 100:.0f}% throttled, rate cap {rate:.0f}/s")
+
+    def serial(messages):
+        results = []
+        for to, body in messages:
+            for _ in range(5):
+                response = requests.post(f"{url}/2010-04-01/Accounts/AC0/Messages.json",
+                                         data={"From": "whatsapp:+1", "To": to, "Body": body},
+                                         auth=("AC0", "token"), headers={"Connection": "close"})
+                if response.status_code != 429:
+                    break
+            results.append(response.json().get("sid") if response.ok else None)
+        return results
+
+    run("serial, new connection", serial, max(1, count // 10))
+
+    for label, limit in ((f"pooled, {rate:.0f}/s bucket", rate), ("pooled, unlimited", 1e9)):
+        sender = WhatsAppSender("AC0", "token", "whatsapp:+1", base_url=url, rate=limit, workers=32, backoff=0.01)
+        run(label, sender.send_many, count)
+        print(f"{'':<28} {sender.stats()}")
+        sender.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Cold-start budget: import time and time to the first webhook reply.
+
+    python -m benchmarks.bench_startup [--runs N] [--verses N] [--import-budget MS] [--response-budget S]
+
+Render's free plan spins the service down when idle, so the first WhatsApp
+message afterwards waits for a whole interpreter start. Each run uses fresh
+interpreters:
+
+* `python -X importtime -c "import app.main"`: total import time, the
+  slowest packages it pulls in, and any LAZY_MODULES loaded at import.
+* `uvicorn app.main:app` on a scratch SQLite database: seconds from spawn
+  until POST /webhook returns a reply, retrying while the port is still
+  closed the way Render's proxy holds Twilio's request.
+
+The app serves a synthetic corpus of --verses verses (default 31,102, the
+size of the full Bible) compiled to a verse store, so warm-up costs what it
+does in production; --verses 0 uses data/ as checked in. One untimed run
+first writes the .pyc files. Exits 1 when a median is over its budget or a
+lazy module is imported with the app.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from app.agents import verse_store
+from benchmarks.common import synthetic_verses, write_corpus
+
+FULL_CORPUS_VERSES = 31_102
+# Must not load before the first reply: the scheduler's, the sender's and the semantic index's dependencies
+LAZY_MODULES = ("apscheduler", "numpy", "requests", "twilio")
+
+
+def import_profile(env):
+    """(total ms, [(cumulative ms, top-level package)], lazy modules imported) for one fresh `import app.main`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    # Children are printed before their parent, indented two spaces per level. Keep only the
+    # subtree of `import app.main`, not what the interpreter's own startup (site, .pth files) loads.
+    total, subtree, pending = 0.0, [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name_field = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        pending.append((depth, name_field.strip(), int(cumulative) / 1000))
+        if depth == 0:
+            if pending[-1][1] == "app.main":
+                total, subtree = pending[-1][2], pending[:-1]
+            pending = []
+
+    packages = {}
+    for depth, name, ms in subtree:
+        if depth == 1:
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0.0) + ms
+    loaded = {name.split(".")[0] for _, name, _ in subtree} & set(LAZY_MODULES)
+    slowest = sorted(((ms, name) for name, ms in packages.items()), reverse=True)
+    return total, slowest, sorted(loaded)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response(env, timeout=60.0):
+    """Seconds from spawning uvicorn until /webhook answers 200"""
+    port = free_port()
+    body = urllib.parse.urlencode({"From": "whatsapp:+15550000001", "Body": "hi"}).encode()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/webhook", data=body, timeout=timeout) as reply:
+                    if reply.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                if server.poll() is not None:
+                    sys.exit(f"uvicorn exited with status {server.returncode}")
+                time.sleep(0.01)
+        sys.exit(f"No reply within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--verses", type=int, default=FULL_CORPUS_VERSES,
+                        help="synthetic corpus size; 0 serves data/ as checked in")
+    parser.add_argument("--import-budget", type=float, default=1500.0, help="median ms for `import app.main`")
+    parser.add_argument("--response-budget", type=float, default=5.0, help="median seconds to the first reply")
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="bible-startup-"))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{workdir / 'startup.db'}", PYTHONPATH=os.getcwd())
+    env.pop("ASYNC_DATABASE_URL", None)
+    if args.verses:
+        corpus = write_corpus(synthetic_verses(args.verses), workdir)
+        verse_store.build(corpus, corpus.with_suffix(".bin"))
+        env["BIBLE_DATA_PATH"] = str(corpus)
+    subprocess.run([sys.executable, "-m", "app.migrations", "upgrade"], env=env, capture_output=True, check=True)
+
+    import_profile(env)
+    profiles = [import_profile(env) for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _, _ in profiles)
+    _, slowest, loaded = profiles[-1]
+    responses = [first_response(env) for _ in range(args.runs)]
+    response_s = statistics.median(responses)
+
+    print(f"corpus              {args.verses or 'data/'} verses")
+    print(f"import app.main     median {import_ms:8.1f} ms   (budget {args.import_budget:.0f} ms)")
+    for ms, name in slowest[:8]:
+        print(f"  {name:<18} {ms:8.1f} ms")
+    print(f"first /webhook reply median {response_s:6.2f} s    (budget {args.response_budget:.1f} s, "
+          f"min {min(responses):.2f}, max {max(responses):.2f})")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at startup, should load lazily: {', '.join(loaded)}")
+        failed = True
+    if import_ms > args.import_budget:
+        print("FAIL: import time over budget")
+        failed = True
+    if response_s > args.response_budget:
+        print("FAIL: first reply over budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
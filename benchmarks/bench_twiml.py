@@ -0,0 +1,49 @@
+"""TwiML rendering benchmark: MessagingResponse + str() vs app.twiml bytes.
+
+    python -m benchmarks.bench_twiml [iterations]
+
+Checks that both produce identical bytes for every reply, then times a
+pre-rendered greeting and a dynamic bookmark confirmation.
+"""
+import sys
+import time
+
+from twilio.twiml.messaging_response import MessagingResponse
+
+from app import twiml
+from app.agents.response_composer import ResponseComposerAgent
+
+
+def legacy(text):
+    response = MessagingResponse()
+    response.message(text)
+    return str(response).encode("utf-8")
+
+
+def timed(label, fn, text, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} {elapsed / iterations * 1e6:8.2f} us/reply")
+    return elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    composer = ResponseComposerAgent()
+    dynamic = composer.compose_bookmark_saved('John 3:16 & <Psalm 23:1> "the LORD"')
+    for text in composer.static_replies() + [dynamic]:
+        assert twiml.message(text) == legacy(text), text
+
+    greeting = composer.compose_greeting()
+    base = timed("greeting, MessagingResponse", legacy, greeting, iterations)
+    fast = timed("greeting, pre-rendered", twiml.message, greeting, iterations)
+    print(f"{'':<36} {base / fast:8.1f}x")
+    base = timed("bookmark, MessagingResponse", legacy, dynamic, iterations)
+    fast = timed("bookmark, escaped into fragments", twiml.message, dynamic, iterations)
+    print(f"{'':<36} {base / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Microbenchmark: verse, range and chapter lookup cost versus corpus size.
+
+    python -m benchmarks.bench_verse_lookup
+
+Lookup time per call should stay flat as the corpus grows from 1k to 31k verses.
+"""
+import random
+import timeit
+
+from app.agents.bible_matcher import BibleMatchingAgent
+from benchmarks.common import synthetic_verses, write_corpus
+
+SIZES = (1_000, 5_000, 10_000, 31_102)
+CALLS = 20_000
+
+
+def bench(size: int):
+    verses = synthetic_verses(size)
+    agent = BibleMatchingAgent(write_corpus(verses))
+    rng = random.Random(size)
+    samples = [rng.choice(verses) for _ in range(256)]
+    singles = [f"{v['book']} {v['chapter']}:{v['verse']}" for v in samples]
+    ranges = [f"{v['book']} {v['chapter']}:{v['verse']}-{v['verse'] + 3}" for v in samples]
+    chapters = [f"{v['book']} {v['chapter']}" for v in samples]
+
+    results = {}
+    for label, refs in (("verse", singles), ("range", ranges), ("chapter", chapters)):
+        it = iter(refs * (CALLS // len(refs) + 1))
+        seconds = timeit.timeit(lambda: agent.get_passage(next(it)), number=CALLS)
+        results[label] = seconds / CALLS * 1e6
+    return results
+
+
+def main():
+    print(f"{'verses':>8}  {'verse us':>9}  {'range us':>9}  {'chapter us':>10}")
+    for size in SIZES:
+        r = bench(size)
+        print(f"{size:>8}  {r['verse']:>9.2f}  {r['range']:>9.2f}  {r['chapter']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
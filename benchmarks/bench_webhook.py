@@ -0,0 +1,226 @@
+"""End-to-end /webhook load test, driven in-process through ASGI.
+
+    python -m benchmarks.bench_webhook [--users N] [--requests N] [--concurrency N]
+                                       [--mix greeting=30,daily=15,...] [--seed N] [--label NAME]
+                                       [--output results.json] [--compare baseline.json]
+                                       [--threshold PCT]
+
+Seeds a fresh SQLite database (through the real migrations) with --users
+users and some reading history, bookmarks and conversation rows each, then
+posts synthetic Twilio form payloads to the production app from
+app.main.create_app (lifespan warm-up included) through httpx's ASGI
+transport, so no network or server is involved. The traffic mix is a
+weighted choice over the intents below. Throughput and p50/p95/p99 latency
+are reported overall and per intent.
+
+--output writes the run as JSON. --compare reads an earlier JSON run and
+flags every intent whose p50 or p95 got more than --threshold percent
+(default 10) slower; the exit status is 1 when anything regressed.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+MESSAGES = {
+    "greeting": ["hi", "hello", "hey there", "good morning"],
+    "daily": ["study", "DAILY", "next chapter", "what's today's study"],
+    "verse": ["verse about fear", "verse about peace", "scripture about hope", "feeling sad, any verse?"],
+    "save": ["save John 3:16", "SAVE Psalm 23:1", "bookmark Romans 8:28"],
+    "read": ["done", "READ", "finished"],
+    "progress": ["progress", "how am i doing", "stats"],
+}
+DEFAULT_MIX = "greeting=25,daily=15,verse=25,save=10,read=10,progress=15"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in MESSAGES:
+            sys.exit(f"Unknown intent {name!r}; choose from {', '.join(MESSAGES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed_database(users, rng):
+    """Create the schema and bulk-load users with history"""
+    from sqlalchemy import insert
+    from app import models
+    from app.database import SessionLocal, engine
+    from app.migrations import upgrade
+
+    upgrade(engine)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.User), [{
+            "phone_number": f"whatsapp:+1555{i:07d}",
+            "current_book": "Matthew",
+            "last_chapter": rng.randint(0, 20),
+            "total_days_engaged": rng.randint(0, 100),
+            "current_streak": rng.randint(0, 10),
+            "chapters_read": rng.randint(0, 60),
+            "total_bookmarks": 2,
+            "reminder_minute": 480,
+        } for i in range(users)])
+        for start in range(1, users + 1, 5000):
+            ids = range(start, min(start + 5000, users + 1))
+            db.execute(insert(models.UserProgress), [{
+                "user_id": user_id, "book": "Matthew", "chapter_start": 1, "chapter_end": 2,
+                "completed": True, "date": now - timedelta(days=day)
+            } for user_id in ids for day in (1, 2, 3)])
+            db.execute(insert(models.Bookmark), [{
+                "user_id": user_id, "book": "John", "chapter": 3, "verse": "16", "tags": []
+            } for user_id in ids for _ in range(2)])
+            db.execute(insert(models.Conversation), [{
+                "user_id": user_id, "message_type": "user_message", "content": "hi",
+                "intent": "greeting", "message_metadata": {}
+            } for user_id in ids for _ in range(4)])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def drive(app, total, concurrency, users, mix, rng):
+    import httpx
+
+    names, weights = list(mix), list(mix.values())
+    plan = []
+    for _ in range(total):
+        intent = rng.choices(names, weights)[0]
+        plan.append((intent, rng.choice(MESSAGES[intent]), f"whatsapp:+1555{rng.randrange(users):07d}"))
+
+    latencies = {name: [] for name in names}
+    errors = 0
+    # Twilio sends a unique MessageSid per message; every request here is a first delivery
+    sids = itertools.count()
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport doesn't send lifespan events; run the app's startup/shutdown around the load
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(intent, body, phone):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                sid = f"SM{next(sids):032x}"
+                response = await client.post("/webhook", data={"From": phone, "Body": body, "MessageSid": sid})
+                latencies[intent].append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        # Warm up caches and connections before measuring
+        await asyncio.gather(*(one(*plan[i % len(plan)]) for i in range(min(50, total))))
+        latencies = {name: [] for name in names}
+        errors = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(one(*item) for item in plan))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def compare(result, baseline, threshold):
+    """Print per-intent deltas against a baseline run; returns True if anything regressed"""
+    regressed = False
+    print(f"\nvs {baseline['config'].get('label') or 'baseline'} ({baseline['timestamp']})")
+    for name, stats in result["intents"].items():
+        before = baseline["intents"].get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (stats[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            flag = " !" if key != "p99_ms" and change > threshold else ""
+            regressed = regressed or bool(flag)
+            cells.append(f"{key[:3]} {change:+6.1f}%{flag}")
+        print(f"  {name:<10} " + "   ".join(cells))
+    change = (result["throughput_rps"] - baseline["throughput_rps"]) / baseline["throughput_rps"] * 100
+    print(f"  {'total':<10} throughput {change:+6.1f}%")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_webhook")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+
+    # The app reads its database URL at import, so point it at a scratch database first
+    workdir = Path(tempfile.mkdtemp(prefix="bible-webhook-"))
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["SCHEDULER_ENABLED"] = "false"
+
+    from app.main import create_app
+
+    started = time.perf_counter()
+    seed_database(args.users, rng)
+    print(f"Seeded {args.users} users in {time.perf_counter() - started:.1f}s ({workdir})")
+    app = create_app()
+
+    latencies, errors, elapsed = asyncio.run(drive(app, args.requests, args.concurrency, args.users, mix, rng))
+
+    samples = [sample for values in latencies.values() for sample in values]
+    result = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "config": {
+            "label": args.label, "users": args.users, "requests": args.requests,
+            "concurrency": args.concurrency, "mix": mix, "seed": args.seed, "python": sys.version.split()[0]
+        },
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "errors": errors,
+        "overall": summarize(samples),
+        "intents": {name: summarize(values) for name, values in latencies.items() if values},
+    }
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}: "
+          f"{result['throughput_rps']} req/s, {errors} errors")
+    print(f"  {'intent':<10} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(result["intents"].items()) + [("overall", result["overall"])]:
+        print(f"  {name:<10} {stats['count']:>6} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if compare(result, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
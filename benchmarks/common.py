@@ -0,0 +1,55 @@
+import json
+import random
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+WORDS = (
+    "lord god jesus christ spirit love peace hope faith grace mercy heart soul "
+    "light life truth word father son people king heaven earth world fear joy "
+    "strength rest trust pray prayer glory holy righteous wisdom kingdom power "
+    "shepherd salvation blessed comfort anxious worry patient kind gentle"
+).split()
+
+SYLLABLES = ("ba", "ra", "el", "im", "on", "ja", "ke", "mi", "th", "sa", "lo", "ni", "de", "ve", "us", "ar")
+
+
+def zipf_vocabulary(size: int = 12_000, seed: int = 3):
+    """Theme words first, then pseudo-words, weighted 1/rank like natural text"""
+    rng = random.Random(seed)
+    vocabulary = list(WORDS)
+    seen = set(vocabulary)
+    while len(vocabulary) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    weights = [1 / rank for rank in range(1, size + 1)]
+    return vocabulary, weights
+
+
+def synthetic_verses(count: int, seed: int = 7, verses_per_chapter: int = 25) -> List[Dict[str, Any]]:
+    """Generate a corpus shaped like the real one (books > chapters > verses)"""
+    rng = random.Random(seed)
+    vocabulary, weights = zipf_vocabulary()
+    verses = []
+    book_number = 0
+    while len(verses) < count:
+        book_number += 1
+        book = f"Book{book_number}"
+        for chapter in range(1, 51):
+            for verse in range(1, verses_per_chapter + 1):
+                text = " ".join(rng.choices(vocabulary, weights, k=rng.randint(8, 30)))
+                verses.append({"book": book, "chapter": chapter, "verse": verse, "text": text.capitalize() + "."})
+                if len(verses) >= count:
+                    return verses
+    return verses
+
+
+def write_corpus(verses: List[Dict[str, Any]], directory: Optional[Path] = None) -> Path:
+    """Write a corpus to a temporary bible_verses.json and return its path"""
+    directory = Path(directory or tempfile.mkdtemp(prefix="bible-bench-"))
+    path = directory / "bible_verses.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"verses": verses}, f)
+    return path
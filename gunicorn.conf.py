@@ -0,0 +1,11 @@
+"""Gunicorn settings, read automatically from the working directory"""
+import os
+
+preload_app = True
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+def when_ready(server):
+    """Load the corpus in the master before forking, so workers share its pages (see registry.warm_up)"""
+    from app.agents.registry import warm_up
+    warm_up()
@@ -0,0 +1,32 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.migrations import upgrade
+
+@pytest.fixture
+def engine(tmp_path):
+    """A migrated SQLite database in a temporary directory"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'bible_agent.db'}", connect_args={"check_same_thread": False})
+    upgrade(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, autoflush=False)
+
+@pytest.fixture
+def run_async(engine):
+    """Run `test(db)` on an AsyncSession (aiosqlite) over the same database"""
+    def run(test):
+        async def main():
+            async_engine = create_async_engine(f"sqlite+aiosqlite:///{engine.url.database}")
+            try:
+                async with async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)() as db:
+                    return await test(db)
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
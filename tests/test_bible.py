@@ -0,0 +1,42 @@
+import asyncio
+from pathlib import Path
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.agents.registry import AgentRegistry
+from app.routes import bible
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "bible_verses.json"
+
+@pytest.fixture
+def get(monkeypatch):
+    """GET against the bible router over the checked-in sample corpus"""
+    registry = AgentRegistry(DATA_PATH)
+    monkeypatch.setattr(bible, "get_registry", lambda: registry)
+    app = FastAPI()
+    app.include_router(bible.router, prefix="/bible")
+
+    def request(path, **headers):
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get(path, headers=headers)
+        return asyncio.run(send())
+    return request
+
+def test_chapter_etag_revalidation(get):
+    first = get("/bible/verses/matthew/1")
+    etag = first.headers["etag"]
+
+    assert first.status_code == 200
+    assert first.json()["verses"][0]["verse"] == 1
+    for if_none_match in (etag, f"W/{etag}", f'"stale", W/{etag}', "*"):
+        response = get("/bible/verses/matthew/1", **{"If-None-Match": if_none_match})
+        assert response.status_code == 304, if_none_match
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+def test_chapter_etag_mismatch(get):
+    response = get("/bible/verses/matthew/1", **{"If-None-Match": '"stale", W/"older"'})
+
+    assert response.status_code == 200
+    assert response.json()["book"] == "Matthew"
@@ -0,0 +1,23 @@
+import asyncio
+from app import main, models
+from app.agents.conversation_log import ConversationLogWriter
+
+def test_shutdown_flushes_conversation_log_when_background_start_failed(monkeypatch, session_factory):
+    writer = ConversationLogWriter(session_factory=session_factory, flush_interval=60)
+    async def warm_up():
+        pass
+    def start_background():
+        raise RuntimeError("semantic index is corrupt")
+    monkeypatch.setattr(main, "_warm_up", warm_up)
+    monkeypatch.setattr(main, "_start_background", start_background)
+    monkeypatch.setattr(main, "conversation_log", writer)
+    app = main.create_app()
+
+    async def serve_one_message():
+        async with app.router.lifespan_context(app):
+            writer.enqueue(1, "user_message", "hi", intent="greeting")
+
+    asyncio.run(serve_one_message())
+
+    with session_factory() as db:
+        assert db.query(models.Conversation.content).all() == [("hi",)]
@@ -0,0 +1,197 @@
+import threading
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event, update
+from app import models
+from app.agents.conversation_log import ConversationLogWriter
+from app.agents.memory import AsyncMemoryAgent, MemoryAgent
+from app.cache import LRUCache
+
+PHONE = "whatsapp:+15550000001"
+
+def count(session_factory, model) -> int:
+    with session_factory() as db:
+        return db.query(model).count()
+
+def test_first_message_rolled_back_leaves_no_user(session_factory):
+    db = session_factory()
+    agent = MemoryAgent(db)
+    with pytest.raises(RuntimeError):
+        with agent.unit_of_work():
+            agent.get_or_create_user(PHONE)
+            raise RuntimeError("reply failed")
+    db.close()
+
+    assert count(session_factory, models.User) == 0
+
+def test_async_first_message_rolled_back_leaves_no_user(session_factory, run_async):
+    async def first_message(db):
+        agent = AsyncMemoryAgent(db)
+        async with agent.unit_of_work():
+            await agent.get_or_create_user(PHONE)
+            raise RuntimeError("reply failed")
+
+    with pytest.raises(RuntimeError):
+        run_async(first_message)
+
+    assert count(session_factory, models.User) == 0
+
+def test_concurrent_first_messages_share_one_user(session_factory):
+    start = threading.Barrier(6)
+    ids, errors = [], []
+
+    def first_message():
+        db = session_factory()
+        try:
+            agent = MemoryAgent(db)
+            start.wait()
+            with agent.unit_of_work():
+                ids.append(agent.get_or_create_user(PHONE, fresh=True).id)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=first_message) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(ids)) == 1
+    assert count(session_factory, models.User) == 1
+
+def seed_user(session_factory) -> int:
+    with session_factory() as db:
+        return MemoryAgent(db).get_or_create_user(PHONE).id
+
+def snapshot(session_factory):
+    """Row counts and user counters that a message can change"""
+    with session_factory() as db:
+        user = db.query(models.User).filter(models.User.phone_number == PHONE).one()
+        return {
+            "progress": db.query(models.UserProgress).count(),
+            "bookmarks": db.query(models.Bookmark).count(),
+            "conversations": db.query(models.Conversation).count(),
+            "user": (user.last_chapter, user.total_days_engaged, user.current_streak,
+                     user.chapters_read, user.total_bookmarks),
+        }
+
+def write_message(agent: MemoryAgent, user_id: int):
+    agent.save_conversation(user_id, "user_message", "done")
+    agent.update_user_progress(user_id, "Matthew", 1, 3)
+    agent.add_bookmark(user_id, "John 3:16")
+    agent.save_conversation(user_id, "agent_response", "Saved", intent="bookmark")
+
+@pytest.fixture(params=[False, True], ids=["direct", "write-behind"])
+def log_writer(request, session_factory):
+    if not request.param:
+        yield None
+        return
+    writer = ConversationLogWriter(session_factory=session_factory, flush_interval=0.01)
+    yield writer
+    writer.stop()
+
+def test_unit_of_work_commits_every_write(session_factory, log_writer):
+    user_id = seed_user(session_factory)
+    with session_factory() as db:
+        agent = MemoryAgent(db, log_writer=log_writer)
+        with agent.unit_of_work():
+            write_message(agent, user_id)
+    if log_writer is not None:
+        log_writer.stop()
+
+    assert snapshot(session_factory) == {
+        "progress": 1, "bookmarks": 1, "conversations": 2, "user": (3, 1, 1, 3, 1)
+    }
+
+def test_unit_of_work_rolls_back_every_write(session_factory, log_writer):
+    user_id = seed_user(session_factory)
+    before = snapshot(session_factory)
+    with session_factory() as db:
+        agent = MemoryAgent(db, log_writer=log_writer)
+        with pytest.raises(RuntimeError):
+            with agent.unit_of_work():
+                write_message(agent, user_id)
+                raise RuntimeError("reply failed")
+
+    assert snapshot(session_factory) == before
+    assert log_writer is None or log_writer.enqueued == 0
+
+def test_async_unit_of_work_rolls_back_every_write(session_factory, run_async, log_writer):
+    user_id = seed_user(session_factory)
+    before = snapshot(session_factory)
+
+    async def failed_message(db):
+        agent = AsyncMemoryAgent(db, log_writer=log_writer)
+        async with agent.unit_of_work():
+            await agent.save_conversation(user_id, "user_message", "done")
+            await agent.update_user_progress(user_id, "Matthew", 1, 3)
+            await agent.add_bookmark(user_id, "John 3:16")
+            raise RuntimeError("reply failed")
+
+    with pytest.raises(RuntimeError):
+        run_async(failed_message)
+
+    assert snapshot(session_factory) == before
+    assert log_writer is None or log_writer.enqueued == 0
+
+@contextmanager
+def statements(engine):
+    """Collect the SQL statements executed on the engine inside the block"""
+    executed = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield executed
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def test_cached_user_is_read_without_sql(engine, session_factory):
+    cache = LRUCache(ttl=60)
+    user_id = seed_user(session_factory)
+    with session_factory() as db:
+        MemoryAgent(db, user_cache=cache).get_or_create_user(PHONE)
+
+    with session_factory() as db, statements(engine) as executed:
+        agent = MemoryAgent(db, user_cache=cache)
+        user = agent.get_or_create_user(PHONE)
+        stats = agent.get_user_stats(user_id)
+
+    assert executed == []
+    assert user.id == user_id
+    assert stats["total_bookmarks"] == 0
+
+def test_writes_invalidate_cached_user(session_factory):
+    cache = LRUCache(ttl=60)
+    user_id = seed_user(session_factory)
+    with session_factory() as db:
+        MemoryAgent(db, user_cache=cache).get_or_create_user(PHONE)
+
+    with session_factory() as db:
+        agent = MemoryAgent(db, user_cache=cache)
+        with agent.unit_of_work():
+            write_message(agent, user_id)
+
+    with session_factory() as db:
+        stats = MemoryAgent(db, user_cache=cache).get_user_stats(user_id)
+    assert (stats["last_chapter"], stats["chapters_read"], stats["total_bookmarks"]) == (3, 3, 1)
+
+def test_fresh_read_skips_cached_snapshot(session_factory):
+    cache = LRUCache(ttl=60)
+    seed_user(session_factory)
+    with session_factory() as db:
+        MemoryAgent(db, user_cache=cache).get_or_create_user(PHONE)
+    # Another worker's write, which this worker's cache does not see
+    with session_factory() as db:
+        db.execute(update(models.User).values(last_chapter=7))
+        db.commit()
+
+    with session_factory() as db:
+        agent = MemoryAgent(db, user_cache=cache)
+        assert agent.get_or_create_user(PHONE).last_chapter == 0
+    with session_factory() as db:
+        agent = MemoryAgent(db, user_cache=cache)
+        assert agent.get_or_create_user(PHONE, fresh=True).last_chapter == 7
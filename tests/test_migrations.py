@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine, text
+from app import models
+from app.migrations import MIGRATIONS, current_version, explain_hot_queries, upgrade
+
+def test_upgrade_applies_every_migration(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bible_agent.db'}")
+
+    assert upgrade(engine) == [number for number, _, _ in MIGRATIONS]
+    assert current_version(engine) == MIGRATIONS[-1][0]
+    assert upgrade(engine) == []
+
+def test_hot_queries_use_an_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bible_agent.db'}")
+    upgrade(engine)
+
+    results = explain_hot_queries(engine)
+
+    assert results
+    scans = [f"{name}:\n{plan}" for name, plan, ok in results if not ok]
+    assert not scans, "\n".join(scans)
+
+def test_reminder_backfill_matches_reminder_minute(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bible_agent.db'}")
+    upgrade(engine)
+    times = ["09:30", "9:30", "21:05", "7:5", "late", None]
+    with engine.begin() as conn:
+        for number, preferred_time in enumerate(times):
+            conn.execute(
+                text("INSERT INTO users (phone_number, preferred_time) VALUES (:phone, :preferred_time)"),
+                {"phone": f"whatsapp:+1555000{number:04d}", "preferred_time": preferred_time}
+            )
+        reminder_buckets = next(migrate for _, description, migrate in MIGRATIONS if description == "reminder minute buckets")
+        reminder_buckets(conn)
+        rows = conn.execute(text("SELECT preferred_time, reminder_minute FROM users ORDER BY id")).fetchall()
+
+    assert [minute for _, minute in rows] == [models.reminder_minute(time, "UTC") for time in times]
+    assert rows[1][1] == 570
@@ -0,0 +1,59 @@
+import socket
+import threading
+import pytest
+from app.agents.sender import SendError, WhatsAppSender
+
+@pytest.fixture
+def twilio():
+    """A local server that reads each request, then hangs up ("drop") or never answers ("hang")"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    state = {"mode": "drop", "requests": 0, "open": []}
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            conn.recv(65536)
+            state["requests"] += 1
+            if state["mode"] == "drop":
+                conn.close()
+            else:
+                state["open"].append(conn)
+
+    threading.Thread(target=serve, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.getsockname()[1]}"
+    yield state
+    server.close()
+    for conn in state["open"]:
+        conn.close()
+
+def sender(base_url: str) -> WhatsAppSender:
+    return WhatsAppSender("AC123", "token", "whatsapp:+15550000000", base_url=base_url,
+                          max_retries=3, backoff=0.001, timeout=0.5)
+
+@pytest.mark.parametrize("mode", ["drop", "hang"])
+def test_request_that_reached_twilio_is_not_retried(twilio, mode):
+    twilio["mode"] = mode
+    whatsapp = sender(twilio["url"])
+
+    with pytest.raises(SendError):
+        whatsapp.send("whatsapp:+15550000001", "Today's reading")
+
+    assert twilio["requests"] == 1
+    assert whatsapp.stats() == {"sent": 0, "failed": 1, "retried": 0}
+
+def test_connection_refused_is_retried():
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    port = closed.getsockname()[1]
+    closed.close()
+    whatsapp = sender(f"http://127.0.0.1:{port}")
+
+    with pytest.raises(SendError):
+        whatsapp.send("whatsapp:+15550000001", "Today's reading")
+
+    assert whatsapp.stats() == {"sent": 0, "failed": 1, "retried": 3}
@@ -0,0 +1,25 @@
+import pytest
+from twilio.twiml.messaging_response import MessagingResponse
+from app import twiml
+from app.agents.response_composer import ResponseComposerAgent
+
+def messaging_response(text: str) -> bytes:
+    response = MessagingResponse()
+    response.message(text)
+    return str(response).encode("utf-8")
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Peace be with you 🙏",
+    'John 3:16 & <Psalm 23:1> "the LORD" \'s',
+    "a]]>b",
+    "<![CDATA[x]]>",
+    "line one\nline two\r\n&amp;",
+])
+def test_message_matches_messaging_response(text):
+    assert twiml.render(text) == messaging_response(text)
+    assert twiml.message(text) == messaging_response(text)
+
+def test_prerendered_replies_match_messaging_response():
+    for text in ResponseComposerAgent().static_replies():
+        assert twiml.message(text) == messaging_response(text)
@@ -0,0 +1,67 @@
+from pathlib import Path
+import pytest
+from app import models
+from app.agents.conversation_log import ConversationLogWriter
+from app.agents.memory import MemoryAgent
+from app.agents.registry import AgentRegistry
+from app.cache import LRUCache
+from app.routes import whatsapp
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "bible_verses.json"
+PHONE = "whatsapp:+15550000001"
+
+@pytest.fixture
+def reply(monkeypatch, session_factory, run_async):
+    """whatsapp._reply on the test database, as a worker with its own caches and log would run it"""
+    registry = AgentRegistry(DATA_PATH)
+    writer = ConversationLogWriter(session_factory=session_factory)
+    monkeypatch.setattr(whatsapp, "get_registry", lambda: registry)
+    monkeypatch.setattr(whatsapp, "conversation_log", writer)
+    monkeypatch.setattr(whatsapp, "user_cache", LRUCache(ttl=60))
+    with session_factory() as db:
+        MemoryAgent(db).get_or_create_user(PHONE)
+
+    def send(body, message_sid):
+        labels = {"intent": "unknown"}
+        async def handle(db):
+            return await whatsapp._reply(db, PHONE, body, message_sid, labels)
+        return run_async(handle), labels["intent"]
+    yield send
+    writer.stop()
+
+def counts(session_factory):
+    with session_factory() as db:
+        user = db.query(models.User).one()
+        return db.query(models.Bookmark).count(), user.total_bookmarks, db.query(models.ProcessedMessage).count()
+
+def test_retried_write_runs_once(reply, session_factory):
+    body, intent = reply("save John 3:16", "SM1")
+    retry_body, retry_intent = reply("save John 3:16", "SM1")
+
+    assert (intent, retry_intent) == ("bookmark", "duplicate")
+    assert retry_body == body
+    assert counts(session_factory) == (1, 1, 1)
+
+def test_sid_committed_by_another_worker_first(reply, session_factory, monkeypatch):
+    handle_message = whatsapp._handle_message
+
+    async def raced(memory, from_number, message_body, intent_data):
+        response = await handle_message(memory, from_number, message_body, intent_data)
+        # Another worker finishes the same message while this one is still handling it
+        with session_factory() as db:
+            MemoryAgent(db).save_processed_message("SM2", "reply from the other worker")
+        return response
+
+    monkeypatch.setattr(whatsapp, "_handle_message", raced)
+    body, intent = reply("save John 3:16", "SM2")
+
+    assert intent == "duplicate"
+    assert b"reply from the other worker" in body
+    # This worker's bookmark was rolled back with its sid
+    assert counts(session_factory) == (0, 0, 1)
+
+def test_read_only_reply_records_no_sid(reply, session_factory):
+    _, intent = reply("hi", "SM3")
+
+    assert intent == "greeting"
+    assert counts(session_factory) == (0, 0, 0)